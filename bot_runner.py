@@ -6,15 +6,16 @@
 
 import asyncio
 import logging
+import logging.handlers
+import queue
 import signal
-import sys
-from pathlib import Path
-
-# Добавляем текущую папку в PYTHONPATH
-sys.path.insert(0, str(Path(__file__).parent))
 
 from config import config
-from telegram_bot import initialize_bot
+
+try:
+    import uvloop
+except ImportError:
+    uvloop = None  # uvloop не установлен (например, на Windows) - используем стандартный loop
 
 logger = logging.getLogger(__name__)
 
@@ -25,58 +26,110 @@ class BotRunner:
     def __init__(self):
         self.bot = None
         self.running = False
+        self._stop_event = asyncio.Event()  # Запрос на остановку (сигнал или stop_bot)
     
     async def start_bot(self):
-        """Запускает бота"""
+        """Запускает бота и работает до завершения polling или запроса остановки"""
         logger.info("🚀 Запуск Telegram бота...")
         
+        # aiogram тяжелый, импортируем только когда бот действительно запускается
+        from telegram_bot import initialize_bot
+        
         # Инициализируем бота
-        self.bot = await initialize_bot()
+        self.bot = await initialize_bot(long_poll_timeout=50)
         if not self.bot:
             logger.error("❌ Не удалось инициализировать бота")
             return
         
         self.running = True
         
+        # Запускаем в режиме long polling (один долгий getUpdates вместо частых коротких)
+        # Сигналы обрабатывает BotRunner, поэтому aiogram свои не ставит
+        polling_task = asyncio.create_task(
+            self.bot.start_polling(handle_signals=False),
+            name="telegram_polling"
+        )
+        stop_task = asyncio.create_task(self._stop_event.wait(), name="stop_event")
+        
         try:
-            # Запускаем в режиме polling
-            await self.bot.start_polling()
+            done, _ = await asyncio.wait(
+                {polling_task, stop_task},
+                return_when=asyncio.FIRST_COMPLETED
+            )
+            
+            if polling_task in done:
+                # Polling завершился сам - пробрасываем его ошибку, если была
+                polling_task.result()
+            else:
+                # Запрошена остановка - корректно завершаем polling,
+                # а если он не успел за 5 секунд, задача будет отменена ниже
+                await self.bot.stop_polling()
+                await asyncio.wait({polling_task}, timeout=5)
         except Exception as e:
-            logger.error(f"❌ Ошибка запуска бота: {e}")
+            logger.error("❌ Ошибка запуска бота: %s", e)
             raise
         finally:
+            # Дожидаемся только отмененных задач, у завершенных результат уже получен
+            pending = [task for task in (polling_task, stop_task) if not task.done()]
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
             self.running = False
     
+    def request_stop(self):
+        """Просит start_bot завершиться, безопасно вызывать из обработчика сигнала"""
+        self._stop_event.set()
+    
     async def stop_bot(self):
-        """Останавливает бота"""
-        if self.bot and self.running:
+        """Останавливает бота и закрывает его сессию"""
+        self.request_stop()
+        if self.bot:
             logger.info("🛑 Остановка Telegram бота...")
             await self.bot.stop()
-            self.running = False
+            self.bot = None
     
     def setup_signal_handlers(self):
-        """Настраивает обработчики сигналов для корректного завершения"""
-        def signal_handler(signum, frame):
-            logger.info(f"Получен сигнал {signum}, завершаем работу...")
-            asyncio.create_task(self.stop_bot())
-            sys.exit(0)
+        """
+        Настраивает обработчики сигналов для корректного завершения
+        Должен вызываться внутри работающего event loop
+        """
+        loop = asyncio.get_running_loop()
         
-        signal.signal(signal.SIGINT, signal_handler)
-        signal.signal(signal.SIGTERM, signal_handler)
+        def signal_handler(signum):
+            logger.info("Получен сигнал %s, завершаем работу...", signum)
+            self.request_stop()
+        
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(signum, signal_handler, signum)
 
 
 async def main():
     """Основная функция"""
-    # Настройка логирования
+    # Настройка логирования: запись в файл и консоль идет в отдельном потоке
+    # через очередь, чтобы не блокировать event loop
+    formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    file_handler = logging.FileHandler("logs/telegram_bot.log")
+    stream_handler = logging.StreamHandler()
+    file_handler.setFormatter(formatter)
+    stream_handler.setFormatter(formatter)
+    
+    log_queue = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(log_queue, file_handler, stream_handler)
     logging.basicConfig(
-        level=getattr(logging, config.log_level),
-        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        handlers=[
-            logging.FileHandler("logs/telegram_bot.log"),
-            logging.StreamHandler()
-        ]
+        level=config.log_level_int,
+        handlers=[logging.handlers.QueueHandler(log_queue)]
     )
+    listener.start()
     
+    try:
+        await run_bot()
+    finally:
+        listener.stop()
+
+
+async def run_bot():
+    """Запускает бота и ждет его завершения"""
     logger.info("=" * 50)
     logger.info("🤖 TELEGRAM BOT RUNNER STARTED")
     logger.info("=" * 50)
@@ -96,11 +149,14 @@ async def main():
     except KeyboardInterrupt:
         logger.info("👋 Остановка по Ctrl+C")
     except Exception as e:
-        logger.error(f"💥 Критическая ошибка: {e}")
+        logger.error("💥 Критическая ошибка: %s", e)
     finally:
         await runner.stop_bot()
         logger.info("👋 Telegram бот остановлен")
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    if uvloop is not None:
+        uvloop.run(main())
+    else:
+        asyncio.run(main())
\ No newline at end of file
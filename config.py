@@ -2,13 +2,60 @@
 """
 Конфигурация для WB мониторинга слотов приемки
 """
+import logging
+import operator
 import os
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+from functools import lru_cache
 from typing import Optional
 from dotenv import load_dotenv
 
 
-@dataclass
+# Обязательные поля конфига и быстрый доступ к ним
+_REQUIRED_FIELDS = ("wb_api_key", "google_sheets_url", "telegram_bot_token")
+_GET_REQUIRED_FIELDS = operator.attrgetter(*_REQUIRED_FIELDS)
+
+
+def _parse_bool(value: str) -> bool:
+    """Переменные окружения вида "True"/"false" -> bool"""
+    return value.lower() == "true"
+
+
+# Соответствие полей конфига переменным окружения: (поле, переменная, значение по умолчанию, приведение типа)
+_ENV_MAP = (
+    ("wb_api_key", "WB_API_KEY", "", str),
+    ("wb_base_url", "WB_BASE_URL", "https://supplies-api.wildberries.ru", str),
+    ("max_requests_per_minute", "MAX_REQUESTS_PER_MINUTE", "30", int),
+    ("request_delay_seconds", "REQUEST_DELAY_SECONDS", "2.0", float),
+    ("coefficients_requests_per_minute", "COEFFICIENTS_REQUESTS_PER_MINUTE", "6", int),
+    ("max_concurrent_groups", "MAX_CONCURRENT_GROUPS", "2", int),
+    ("enable_adaptive_monitoring", "ENABLE_ADAPTIVE_MONITORING", "True", _parse_bool),
+    ("min_monitoring_interval", "MIN_MONITORING_INTERVAL", "10", int),
+    ("google_sheets_credentials_file", "GOOGLE_CREDENTIALS_FILE", "credentials.json", str),
+    ("google_sheets_url", "GOOGLE_SHEETS_URL", "", str),
+    ("telegram_bot_token", "TELEGRAM_BOT_TOKEN", "", str),
+    ("database_url", "DATABASE_URL", "sqlite:///wb_monitor.db", str),
+    ("log_level", "LOG_LEVEL", "INFO", str),
+    ("log_file", "LOG_FILE", "wb_monitor.log", str),
+    ("check_interval_seconds", "CHECK_INTERVAL_SECONDS", "120", int),
+)
+
+# Флаг, чтобы .env разбирался только один раз за процесс
+_DOTENV_LOADED = False
+
+
+def load_env_once(override: bool = True):
+    """
+    Загружает переменные из .env файла, повторные вызовы ничего не делают
+    """
+    global _DOTENV_LOADED
+    if _DOTENV_LOADED:
+        return
+    load_dotenv(override=override)
+    _DOTENV_LOADED = True
+
+
+@dataclass(slots=True, frozen=True)
 class Config:
     # WB API настройки
     wb_api_key: str = ""  # Сюда вставим ключ от заказчика
@@ -18,6 +65,7 @@ class Config:
     max_requests_per_minute: int = 30
     request_delay_seconds: float = 2.0  # 60/30 = 2 секунды между запросами
     coefficients_requests_per_minute: int = 6  # Лимит для коэффициентов
+    max_concurrent_groups: int = 2  # Сколько групп задач проверяем одновременно
     
     # Адаптивный мониторинг
     enable_adaptive_monitoring: bool = True  # Включить адаптивные интервалы
@@ -36,10 +84,18 @@ class Config:
     # Логирование
     log_level: str = "INFO"
     log_file: str = "wb_monitor.log"
+    log_level_int: int = field(init=False, repr=False)  # Числовой уровень, вычисляется из log_level
     
     # Интервалы проверки
     check_interval_seconds: int = 120  # Проверяем каждые 2 минуты
     
+    def __post_init__(self):
+        # Неизвестный уровень не должен ронять запуск - откатываемся на INFO
+        level = getattr(logging, self.log_level.upper(), None)
+        if not isinstance(level, int):
+            level = logging.INFO
+        object.__setattr__(self, "log_level_int", level)
+    
     @classmethod
     def from_env(cls, override: bool = True) -> 'Config':
         """
@@ -49,40 +105,22 @@ class Config:
         Args:
             override: Если True, переменные из .env файла переопределят системные переменные окружения
         """
-        # Загружаем переменные из .env файла
-        load_dotenv(override=override)
+        # Загружаем переменные из .env файла (только при первом вызове)
+        load_env_once(override=override)
         
-        return cls(
-            wb_api_key=os.getenv("WB_API_KEY", ""),
-            wb_base_url=os.getenv("WB_BASE_URL", "https://supplies-api.wildberries.ru"),
-            max_requests_per_minute=int(os.getenv("MAX_REQUESTS_PER_MINUTE", "30")),
-            request_delay_seconds=float(os.getenv("REQUEST_DELAY_SECONDS", "2.0")),
-            coefficients_requests_per_minute=int(os.getenv("COEFFICIENTS_REQUESTS_PER_MINUTE", "6")),
-            enable_adaptive_monitoring=os.getenv("ENABLE_ADAPTIVE_MONITORING", "True").lower() == "true",
-            min_monitoring_interval=int(os.getenv("MIN_MONITORING_INTERVAL", "10")),
-            google_sheets_credentials_file=os.getenv("GOOGLE_CREDENTIALS_FILE", "credentials.json"),
-            google_sheets_url=os.getenv("GOOGLE_SHEETS_URL", ""),
-            telegram_bot_token=os.getenv("TELEGRAM_BOT_TOKEN", ""),
-            database_url=os.getenv("DATABASE_URL", "sqlite:///wb_monitor.db"),
-            log_level=os.getenv("LOG_LEVEL", "INFO"),
-            log_file=os.getenv("LOG_FILE", "wb_monitor.log"),
-            check_interval_seconds=int(os.getenv("CHECK_INTERVAL_SECONDS", "120")),
-        )
+        # Одно чтение окружения на поле по таблице _ENV_MAP
+        env = os.environ
+        return cls(**{
+            field_name: cast(env.get(env_name, default))
+            for field_name, env_name, default, cast in _ENV_MAP
+        })
     
     def validate(self) -> bool:
         """
         Проверяет, что все необходимые параметры заполнены
         """
-        required_fields = [
-            "wb_api_key", 
-            "google_sheets_url", 
-            "telegram_bot_token"
-        ]
-        
-        missing_fields = []
-        for field in required_fields:
-            if not getattr(self, field):
-                missing_fields.append(field)
+        values = _GET_REQUIRED_FIELDS(self)
+        missing_fields = [name for name, value in zip(_REQUIRED_FIELDS, values) if not value]
         
         if missing_fields:
             print(f"❌ Не заполнены обязательные поля: {', '.join(missing_fields)}")
@@ -91,5 +129,14 @@ class Config:
         return True
 
 
+@lru_cache(maxsize=1)
+def get_config() -> Config:
+    """
+    Возвращает общий экземпляр конфига
+    Окружение разбирается только при первом вызове
+    """
+    return Config.from_env()
+
+
 # Глобальный экземпляр конфига
-config = Config.from_env()
+config = get_config()
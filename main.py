@@ -5,22 +5,27 @@ WB Slots Monitor - Главный файл запуска
 Мониторинг слотов приемки товаров на Wildberries
 
 Использование:
-    python main.py                 # Запуск мониторинга
+    python main.py                 # Запуск мониторинга (и бота в отдельном процессе)
+    python main.py --no-bot        # Мониторинг без запуска бота (бот запущен отдельно)
     python main.py --test          # Быстрый тест системы
     python main.py --check BARCODE # Ручная проверка товара
+    python main.py --check BARCODE --quantity 10
 """
 
 import asyncio
 import argparse
+import contextlib
+import signal
 import sys
 import os
 from pathlib import Path
 
-# Добавляем текущую папку в PYTHONPATH
-sys.path.insert(0, str(Path(__file__).parent))
-
 from config import config
-from monitor import SlotMonitor, quick_test
+
+try:
+    import uvloop
+except ImportError:
+    uvloop = None  # uvloop не установлен (например, на Windows) - используем стандартный loop
 
 
 def setup_environment():
@@ -30,22 +35,10 @@ def setup_environment():
     # Создаем папки если их нет
     os.makedirs("logs", exist_ok=True)
     os.makedirs("data", exist_ok=True)
-    
-    # Если есть .env файл, загружаем переменные окружения
-    try:
-        from dotenv import load_dotenv
-        if os.path.exists(".env"):
-            load_dotenv()
-            print("✅ Загружены переменные из .env файла")
-    except ImportError:
-        pass  # python-dotenv не установлен
+    # .env загружает config.load_env_once при импорте config, здесь его не трогаем
 
 
-def print_banner():
-    """
-    Выводит красивый баннер при запуске
-    """
-    banner = """
+_BANNER = """
 ╔══════════════════════════════════════════════════════════════╗
 ║                    🚀 WB SLOTS MONITOR 🚀                    ║
 ║                                                              ║
@@ -57,41 +50,98 @@ def print_banner():
 ║                                                              ║
 ╚══════════════════════════════════════════════════════════════╝
     """
-    print(banner)
 
 
-async def run_monitoring():
+def print_banner():
+    """
+    Выводит красивый баннер при запуске
+    """
+    print(_BANNER)
+
+
+async def start_bot_process():
+    """
+    Запускает Telegram бота (bot_runner.py) в отдельном процессе,
+    чтобы polling не делил event loop с мониторингом
+    """
+    if not config.telegram_bot_token:
+        print("⚠️  Telegram Bot токен не установлен - бот не запускается")
+        return None
+    
+    bot_script = Path(__file__).parent / "bot_runner.py"
+    process = await asyncio.create_subprocess_exec(sys.executable, str(bot_script))
+    print(f"🤖 Telegram бот запущен в отдельном процессе (PID {process.pid})")
+    return process
+
+
+async def stop_bot_process(process, timeout: float = 10.0):
+    """
+    Останавливает процесс Telegram бота, при зависании - принудительно
+    """
+    if process is None or process.returncode is not None:
+        return
+    
+    # После Ctrl+C SIGINT получает и процесс бота - он может завершиться раньше нас
+    with contextlib.suppress(ProcessLookupError):
+        process.terminate()
+    try:
+        await asyncio.wait_for(process.wait(), timeout=timeout)
+    except asyncio.TimeoutError:
+        with contextlib.suppress(ProcessLookupError):
+            process.kill()
+        await process.wait()
+    print(f"🛑 Процесс Telegram бота (PID {process.pid}) остановлен")
+
+
+async def run_monitoring(start_bot: bool = True):
     """
     Запускает основной мониторинг
+    start_bot=False - бот не запускается (например, он уже работает через bot_runner.py:
+    два процесса с одним токеном конфликтовали бы на getUpdates)
     """
     print("🚀 Запуск мониторинга слотов...")
     
-    monitor = SlotMonitor()
-    await monitor.start_monitoring()
+    from monitor import SlotMonitor
+    
+    # SIGINT раннер event loop обрабатывает сам (отменяет задачу), SIGTERM
+    # (например, systemctl stop) регистрируем на loop так же - через отмену задачи,
+    # чтобы процесс бота тоже был остановлен
+    loop = asyncio.get_running_loop()
+    try:
+        loop.add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
+    except NotImplementedError:
+        pass  # Windows: обработчики сигналов на loop не поддерживаются
+    
+    bot_process = await start_bot_process() if start_bot else None
+    
+    try:
+        monitor = SlotMonitor()
+        await monitor.start_monitoring()
+    finally:
+        # Срабатывает и при Ctrl+C/SIGTERM: задача мониторинга отменяется
+        await stop_bot_process(bot_process)
 
 
 async def run_test():
     """
     Запускает быстрый тест системы
     """
+    from monitor import quick_test
+    
     print("🧪 Запуск тестирования системы...")
     await quick_test()
 
 
-async def check_product(barcode: str):
+async def check_product(barcode: str, quantity: int):
     """
     Проверяет конкретный товар
     """
+    from monitor import SlotMonitor
+    
     print(f"🔍 Проверка товара {barcode}...")
     
     monitor = SlotMonitor()
     
-    # Запрашиваем количество
-    try:
-        quantity = int(input("Введите количество товара: "))
-    except ValueError:
-        quantity = 1
-    
     slots = await monitor.manual_check(barcode, quantity)
     
     print(f"\n📊 Результаты проверки:")
@@ -102,24 +152,32 @@ async def check_product(barcode: str):
             print(f"✅ {slot.barcode}: найдено {len(slot.warehouses)} складов")
 
 
+def run_async(coro):
+    """
+    Запускает корутину в event loop, на uvloop если он доступен
+    """
+    if uvloop is not None:
+        return uvloop.run(coro)
+    return asyncio.run(coro)
+
+
 def validate_config():
     """
     Проверяет конфигурацию перед запуском
     """
     print("🔧 Проверка конфигурации...")
     
-    # Проверяем обязательные файлы
-    required_files = [
+    # Проверяем обязательные файлы (одно чтение каталога вместо stat на каждый файл)
+    required_files = (
         "config.py",
         "wb_api.py", 
         "sheets_parser.py",
         "monitor.py"
-    ]
+    )
     
-    missing_files = []
-    for file in required_files:
-        if not os.path.exists(file):
-            missing_files.append(file)
+    with os.scandir(".") as entries:
+        present_files = {entry.name for entry in entries}
+    missing_files = [file for file in required_files if file not in present_files]
     
     if missing_files:
         print(f"❌ Отсутствуют файлы: {', '.join(missing_files)}")
@@ -162,12 +220,25 @@ def main():
         help="Проверить конкретный товар по баркоду"
     )
     
+    parser.add_argument(
+        "--quantity",
+        type=int,
+        default=None,
+        help="Количество товара для --check (если не указано, будет запрошено)"
+    )
+    
     parser.add_argument(
         "--config",
         action="store_true", 
         help="Показать текущую конфигурацию"
     )
     
+    parser.add_argument(
+        "--no-bot",
+        action="store_true",
+        help="Не запускать Telegram бота (если он уже запущен через bot_runner.py)"
+    )
+    
     parser.add_argument(
         "--no-banner",
         action="store_true",
@@ -179,8 +250,8 @@ def main():
     # Настройка окружения
     setup_environment()
     
-    # Показываем баннер
-    if not args.no_banner:
+    # Показываем баннер (только в интерактивном терминале)
+    if not args.no_banner and sys.stdout.isatty():
         print_banner()
     
     # Проверяем конфигурацию
@@ -199,19 +270,28 @@ def main():
         return
     
     elif args.test:
-        asyncio.run(run_test())
+        run_async(run_test())
         return
     
     elif args.check:
-        asyncio.run(check_product(args.check))
+        quantity = args.quantity
+        if quantity is None:
+            # Спрашиваем до запуска event loop, чтобы input() его не блокировал
+            try:
+                quantity = int(input("Введите количество товара: "))
+            except ValueError:
+                quantity = 1
+        run_async(check_product(args.check, quantity))
         return
     
     else:
         # Основной режим - мониторинг
         try:
-            asyncio.run(run_monitoring())
+            run_async(run_monitoring(start_bot=not args.no_bot))
         except KeyboardInterrupt:
             print("\n👋 Остановка по Ctrl+C")
+        except asyncio.CancelledError:
+            print("\n👋 Остановка по сигналу завершения")
         except Exception as e:
             print(f"\n💥 Критическая ошибка: {e}")
             sys.exit(1)
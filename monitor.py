@@ -4,23 +4,108 @@
 """
 import asyncio
 import logging
+import os
+import random
 import time
-from typing import List, Dict, Any, Optional, Set
-from datetime import datetime, timedelta
-from dataclasses import dataclass, asdict
-import json
+from typing import List, Dict, Any, Hashable, Optional, Set, Tuple
+from collections import Counter, defaultdict
+from bisect import bisect_left, bisect_right
+from datetime import date, datetime, timedelta
+from dataclasses import dataclass, field
+from functools import lru_cache
 
 from wb_api import WildberriesAPI, ProductInfo, SlotInfo, AcceptanceCoefficient
 from sheets_parser import GoogleSheetsParser, MonitoringTask
 from config import config
+from slot_utils import (
+    load_json_file, dump_json_file, load_json_lines, append_json_line,
+    found_slots_filename, migrate_found_slots_files, TokenBucketLimiter
+)
 
 logger = logging.getLogger(__name__)
 
+# Коледино (507) и Щербинка (336442) принимают только монопаллеты
+MONOPALLET_ONLY_WAREHOUSES = frozenset({507, 336442})
 
-@dataclass
+
+def _active_slot_key(slot_data: Dict[str, Any]) -> tuple:
+    """Ключ слота из его словаря (to_dict), совпадает с FoundSlot.slot_key"""
+    return (slot_data['barcode'], slot_data['warehouse_id'], slot_data['date'],
+            slot_data['box_type_name'], slot_data['coefficient'])
+
+
+@lru_cache(maxsize=32)
+def _load_day_stats(filename: str, mtime: float):
+    """
+    Разбирает файл найденных слотов за день в (количество, коэффициенты, счетчик складов)
+    mtime входит в ключ кэша, поэтому дописанный файл текущего дня перечитывается
+    """
+    day_slots = load_json_lines(filename)
+    
+    coefficients = tuple(
+        coef for coef in (slot_data.get("coefficient", -1) for slot_data in day_slots)
+        if coef >= 0
+    )
+    warehouses = Counter(slot_data.get("warehouse_name", "Неизвестно") for slot_data in day_slots)
+    
+    return len(day_slots), coefficients, warehouses
+
+
+def _read_day_stats(filename: str):
+    """
+    Статистика файла за день или None, если файла нет
+    Файлы прошлых дней не меняются, поэтому разбираются один раз
+    """
+    try:
+        mtime = os.stat(filename).st_mtime
+    except FileNotFoundError:
+        return None
+    return _load_day_stats(filename, mtime)
+
+
+class ExpiringKeySet:
+    """
+    Множество ключей с ограниченным размером и временем жизни
+    Ключи хранятся в порядке добавления, поэтому устаревшие и лишние
+    всегда лежат в начале словаря и удаляются оттуда
+    """
+    
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._expires: Dict[Hashable, float] = {}  # ключ -> момент истечения (time.monotonic)
+    
+    def _prune(self, now: float):
+        while self._expires:
+            key, expires_at = next(iter(self._expires.items()))
+            if expires_at > now and len(self._expires) <= self.maxsize:
+                break
+            del self._expires[key]
+    
+    def add(self, key: Hashable) -> bool:
+        """Добавляет ключ, возвращает False, если он уже был и еще не истек"""
+        now = time.monotonic()
+        self._prune(now)
+        if key in self._expires:
+            return False
+        self._expires[key] = now + self.ttl
+        self._prune(now)
+        return True
+    
+    def __contains__(self, key: Hashable) -> bool:
+        expires_at = self._expires.get(key)
+        return expires_at is not None and expires_at > time.monotonic()
+    
+    def __len__(self) -> int:
+        self._prune(time.monotonic())
+        return len(self._expires)
+
+
+@dataclass(slots=True, frozen=True)
 class FoundSlot:
     """
     Информация о найденном подходящем слоте с коэффициентом приемки
+    Неизменяемый, поэтому ключ и словарь для сериализации можно кэшировать на экземпляре
     """
     barcode: str
     warehouse_id: int
@@ -31,6 +116,28 @@ class FoundSlot:
     allow_unload: bool
     found_at: datetime
     monitoring_task: MonitoringTask
+    # True, если доступность и критерии задачи уже проверены при поиске слота
+    prechecked: bool = field(default=False, repr=False, compare=False)
+    
+    # Вычисляемые поля (заполняются в __post_init__ и to_dict)
+    date_iso: str = field(init=False, repr=False, compare=False)
+    slot_key: tuple = field(init=False, repr=False, compare=False)
+    notify_key: tuple = field(init=False, repr=False, compare=False)
+    _as_dict: Optional[Dict[str, Any]] = field(init=False, default=None, repr=False, compare=False)
+    
+    def __post_init__(self):
+        date_iso = self.date.isoformat()
+        object.__setattr__(self, "date_iso", date_iso)
+        # Ключ слота для сравнения активных слотов между циклами (без found_at)
+        object.__setattr__(
+            self, "slot_key",
+            (self.barcode, self.warehouse_id, date_iso, self.box_type_name, self.coefficient)
+        )
+        # Ключ для учета уже найденных слотов: день без времени и без коэффициента
+        object.__setattr__(
+            self, "notify_key",
+            (self.barcode, self.warehouse_id, self.date.toordinal(), self.box_type_name)
+        )
     
     def is_really_available(self) -> bool:
         """Проверяет, действительно ли слот доступен по всем критериям"""
@@ -55,28 +162,25 @@ class FoundSlot:
         return True
     
     def to_dict(self) -> Dict[str, Any]:
-        """Конвертация в словарь для сериализации"""
-        return {
-            "barcode": self.barcode,
-            "warehouse_id": self.warehouse_id,
-            "warehouse_name": self.warehouse_name,
-            "coefficient": self.coefficient,
-            "box_type_name": self.box_type_name,
-            "date": self.date.isoformat(),
-            "allow_unload": self.allow_unload,
-            "found_at": self.found_at.isoformat(),
-            "is_available": self.is_really_available(),
-            "matches_criteria": self.matches_criteria(),
-            "task": {
-                "barcode": self.monitoring_task.barcode,
-                "quantity": self.monitoring_task.quantity,
-                "allowed_warehouses": self.monitoring_task.allowed_warehouses,
-                "max_coefficient": self.monitoring_task.max_coefficient,
-                "date_from": self.monitoring_task.date_from.isoformat(),
-                "date_to": self.monitoring_task.date_to.isoformat(),
-                "is_active": self.monitoring_task.is_active
-            }
-        }
+        """
+        Конвертация в словарь для сериализации
+        Слот после создания не меняется, поэтому словарь строится один раз
+        """
+        if self._as_dict is None:
+            object.__setattr__(self, "_as_dict", {
+                "barcode": self.barcode,
+                "warehouse_id": self.warehouse_id,
+                "warehouse_name": self.warehouse_name,
+                "coefficient": self.coefficient,
+                "box_type_name": self.box_type_name,
+                "date": self.date_iso,
+                "allow_unload": self.allow_unload,
+                "found_at": self.found_at.isoformat(),
+                "is_available": self.prechecked or self.is_really_available(),
+                "matches_criteria": self.prechecked or self.matches_criteria(),
+                "task": self.monitoring_task.as_dict
+            })
+        return self._as_dict
 
 
 class SlotMonitor:
@@ -88,11 +192,22 @@ class SlotMonitor:
         self.wb_api = WildberriesAPI(config.wb_api_key)
         self.sheets_parser = GoogleSheetsParser(
             config.google_sheets_credentials_file,
-            config.google_sheets_url
+            config.google_sheets_url,
+            wb_api=self.wb_api
         )
         
         # Кэш для предотвращения дублирования уведомлений
-        self.notified_slots: Set[str] = set()
+        # Ограничен по размеру и живет сутки, чтобы не расти бесконечно
+        self.notified_slots = ExpiringKeySet(maxsize=100_000, ttl=24 * 60 * 60)
+        
+        # Ограничение числа групп задач, проверяемых параллельно
+        self._group_semaphore = asyncio.Semaphore(config.max_concurrent_groups)
+        
+        # Склады из прошлого цикла: по ним коэффициенты запрашиваются заранее,
+        # параллельно с чтением таблицы
+        self._recent_warehouses: Set[int] = set()
+        self._cycle_warehouses: Set[int] = set()  # Склады, собранные в текущем цикле
+        self._cycle_coefficient_requests = 0  # Запросы коэффициентов в текущем цикле
         
         # Статистика работы
         self.stats = {
@@ -105,17 +220,30 @@ class SlotMonitor:
         # Telegram бот для уведомлений
         self.telegram_bot = None
         
-        # Отслеживание циклов мониторинга для соблюдения лимита 6/минуту
-        self.monitoring_cycles = []  # Времена запуска циклов
-        self.current_minute_start = None  # Начало текущей минуты
-        self.cycles_in_current_minute = 0  # Счетчик циклов в текущей минуте
+        # Частота циклов мониторинга: в адаптивном режиме упираемся в лимит
+        # коэффициентов (6/минуту), иначе - фиксированный интервал проверки
+        if config.enable_adaptive_monitoring:
+            cycles_per_second = config.coefficients_requests_per_minute / 60
+        else:
+            cycles_per_second = 1 / config.check_interval_seconds
+        self.cycle_limiter = TokenBucketLimiter(cycles_per_second)
+        
+        # Пауза перед повтором после ошибки цикла (удваивается до 5 минут)
+        self._error_backoff = 1.0
         
         # Текущие актуальные слоты для новых пользователей
         self.current_active_slots = []  # Список текущих актуальных слотов
+        self.current_active_keys: frozenset = frozenset()  # Ключи текущих слотов для быстрого сравнения
         self.active_slots_file = "current_active_slots.json"
+        # Группы задач проверяются параллельно: записи файла активных слотов идут по очереди,
+        # иначе два потока писали бы в один временный файл
+        self._active_slots_lock = asyncio.Lock()
         
         # Загружаем существующие активные слоты при старте
         self._load_active_slots()
+        
+        # Старые файлы найденных слотов (.json) переводим в JSON Lines
+        migrate_found_slots_files()
     
     async def start_monitoring(self):
         """
@@ -136,84 +264,42 @@ class SlotMonitor:
             logger.warning("⚠️ Telegram бот не доступен - уведомления отключены")
             self.telegram_bot = None
         
-        # Проверяем подключение к API
-        if not await self.wb_api.test_connection():
-            logger.error("❌ Не удалось подключиться к WB API")
-            return
-        
-        # Адаптивный интервал мониторинга
-        last_cycle_duration = 0
-        
-        while True:
-            try:
-                cycle_start = time.time()
-                await self._perform_monitoring_cycle()
-                cycle_duration = time.time() - cycle_start
-                
-                # Вычисляем паузу для равномерного распределения циклов
-                pause_duration = self._calculate_dynamic_pause(cycle_duration)
-                
-                logger.info(f"😴 Цикл завершен за {cycle_duration:.1f}с, пауза {pause_duration:.1f}с")
-                if pause_duration > 0:
-                    await asyncio.sleep(pause_duration)
-                
-            except KeyboardInterrupt:
-                logger.info("⏹️ Получен сигнал остановки")
-                break
-            except Exception as e:
-                logger.error(f"❌ Ошибка в цикле мониторинга: {e}")
-                self.stats["errors_count"] += 1
-                # При ошибке ждем меньше, чтобы быстрее восстановиться
-                await asyncio.sleep(30)
-    
-    def _calculate_dynamic_pause(self, cycle_duration: float) -> float:
-        """
-        Вычисляет динамическую паузу для равномерного распределения 6 циклов на минуту
-        """
-        if not config.enable_adaptive_monitoring:
-            return config.check_interval_seconds
-        
-        now = time.time()
-        
-        # Если это первый цикл или прошла минута - начинаем новую минуту
-        if (self.current_minute_start is None or 
-            now - self.current_minute_start >= 60):
-            self.current_minute_start = now
-            self.cycles_in_current_minute = 1
-            logger.info(f"🕐 Начинаем новую минуту, цикл 1/6")
-        else:
-            self.cycles_in_current_minute += 1
-            logger.info(f"🕐 Цикл {self.cycles_in_current_minute}/6 в текущей минуте")
-        
-        # Если цикл медленный (>10 секунд) - запускаем следующий сразу
-        if cycle_duration >= 10:
-            logger.info(f"🐌 Медленный цикл ({cycle_duration:.1f}с) - запускаем следующий сразу")
-            return 0.1
-        
-        # Если выполнили 6 циклов - ждем до начала следующей минуты
-        if self.cycles_in_current_minute >= 6:
-            time_to_next_minute = 60 - (now - self.current_minute_start)
-            if time_to_next_minute > 0:
-                logger.info(f"✅ Выполнили 6 циклов, ждем до следующей минуты: {time_to_next_minute:.1f}с")
-                return time_to_next_minute
-            return 0.1
-        
-        # Рассчитываем равномерное распределение оставшихся циклов
-        elapsed_time = now - self.current_minute_start
-        remaining_time = 60 - elapsed_time
-        remaining_cycles = 6 - self.cycles_in_current_minute
-        
-        if remaining_cycles <= 0:
-            return 0.1
-        
-        # Пауза = оставшееся время / количество оставшихся циклов
-        optimal_pause = remaining_time / remaining_cycles
-        
-        # Минимальная пауза 0.1 секунды для корректной работы
-        pause = max(0.1, optimal_pause)
-        
-        logger.info(f"📊 Осталось {remaining_cycles} циклов за {remaining_time:.1f}с → пауза {pause:.1f}с")
-        return pause
+        try:
+            # Проверяем подключение к API
+            if not await self.wb_api.test_connection():
+                logger.error("❌ Не удалось подключиться к WB API")
+                return
+            
+            while True:
+                try:
+                    # Ждем разрешения от limiter: медленный цикл сам "накапливает" токен,
+                    # и следующий стартует сразу, быстрые равномерно растягиваются
+                    await self.cycle_limiter.wait()
+                    
+                    cycle_start = time.time()
+                    await self._perform_monitoring_cycle()
+                    cycle_duration = time.time() - cycle_start
+                    
+                    logger.info(f"😴 Цикл завершен за {cycle_duration:.1f}с")
+                    
+                    # Успешный цикл - сбрасываем паузу после ошибок
+                    self._error_backoff = 1.0
+                    
+                except KeyboardInterrupt:
+                    logger.info("⏹️ Получен сигнал остановки")
+                    break
+                except Exception as e:
+                    logger.error(f"❌ Ошибка в цикле мониторинга: {e}")
+                    self.stats["errors_count"] += 1
+                    # Экспоненциальная пауза со случайной добавкой: при разовой ошибке
+                    # быстро восстанавливаемся, при затяжном сбое не долбим API
+                    delay = min(self._error_backoff, 300) + random.uniform(0, self._error_backoff * 0.2)
+                    logger.info(f"⏳ Повтор через {delay:.1f}с")
+                    await asyncio.sleep(delay)
+                    self._error_backoff = min(self._error_backoff * 2, 300)
+        finally:
+            # Закрываем общую HTTP-сессию WB API (в том числе при отмене задачи)
+            await self.wb_api.close()
     
     async def _perform_monitoring_cycle(self):
         """
@@ -230,7 +316,8 @@ class SlotMonitor:
         # Читаем актуальные задачи из таблицы
         try:
             monitoring_tasks = await self.sheets_parser.get_monitoring_tasks()
-            active_tasks = [task for task in monitoring_tasks if task.is_active and task.is_date_valid()]
+            today = date.today()
+            active_tasks = [task for task in monitoring_tasks if task.is_active and task.is_date_valid(today)]
             
             logger.info(f"📋 Загружено {len(monitoring_tasks)} задач, активных: {len(active_tasks)}")
             
@@ -242,18 +329,56 @@ class SlotMonitor:
             logger.info("ℹ️ Нет активных задач для мониторинга")
             return
         
-        # Группируем задачи для оптимизации запросов к API
-        grouped_tasks = self._group_tasks_for_api(active_tasks)
+        # Пока проверяются опции приемки, заранее запрашиваем коэффициенты по складам прошлого цикла
+        self._cycle_coefficient_requests = 0
+        prewarm = None
+        if self._recent_warehouses:
+            prewarm_ids = frozenset(self._recent_warehouses)
+            prewarm = (prewarm_ids, asyncio.create_task(self._get_coefficients(prewarm_ids)))
         
-        # Проверяем каждую группу
-        for group in grouped_tasks:
-            try:
-                await self._check_task_group(group)
-                # Небольшая пауза между группами для соблюдения rate limit
-                await asyncio.sleep(1)
-            except Exception as e:
-                logger.error(f"❌ Ошибка проверки группы задач: {e}")
-                continue
+        try:
+            # Группируем задачи для оптимизации запросов к API
+            grouped_tasks = self._group_tasks_for_api(active_tasks)
+            
+            # Проверяем группы параллельно, число одновременных групп ограничено семафором,
+            # а частоту запросов к API контролирует rate limiter клиента WB
+            self._cycle_warehouses = set()
+            results = await asyncio.gather(
+                *(self._check_task_group(group, prewarm) for group in grouped_tasks),
+                return_exceptions=True
+            )
+            self._recent_warehouses = self._cycle_warehouses
+        finally:
+            # Если заранее запрошенные коэффициенты не понадобились - не ждем их
+            if prewarm is not None:
+                prewarm_task = prewarm[1]
+                if not prewarm_task.done():
+                    prewarm_task.cancel()
+                elif not prewarm_task.cancelled():
+                    prewarm_task.exception()  # Помечаем ошибку как обработанную
+        
+        # Слоты всех групп обрабатываем вместе: активные слоты - это набор за весь цикл,
+        # иначе каждая группа подменяла бы его своими слотами
+        found_slots: List[FoundSlot] = []
+        all_groups_checked = True
+        for result in results:
+            if isinstance(result, asyncio.CancelledError):
+                raise result
+            if isinstance(result, BaseException):
+                logger.error(f"❌ Ошибка проверки группы задач: {result}")
+                all_groups_checked = False
+            elif result is None:
+                all_groups_checked = False  # Ошибка API уже залогирована в группе
+            else:
+                found_slots.extend(result)
+        
+        if not all_groups_checked:
+            # Неполный набор слотов выглядел бы как исчезновение слотов непроверенных групп,
+            # а в следующем цикле - как их повторное появление с новыми уведомлениями
+            logger.warning("⚠️ Не все группы задач проверены, активные слоты не обновляем")
+            return
+        
+        await self._notify_about_found_slots(found_slots)
     
     def _group_tasks_for_api(self, tasks: List[MonitoringTask]) -> List[List[MonitoringTask]]:
         """
@@ -271,77 +396,123 @@ class SlotMonitor:
         logger.info(f"📦 Разбили {len(tasks)} задач на {len(groups)} групп")
         return groups
     
-    async def _check_task_group(self, tasks: List[MonitoringTask]):
+    async def _check_task_group(self, tasks: List[MonitoringTask],
+                                prewarm: Optional[Tuple[frozenset, asyncio.Task]] = None
+                                ) -> Optional[List[FoundSlot]]:
         """
         Проверяет группу задач мониторинга с использованием реальных коэффициентов приемки
+        prewarm - (ID складов, задача) с коэффициентами, запрошенными в начале цикла
+        Возвращает подходящие слоты группы или None, если группу проверить не удалось
         """
-        # Конвертируем задачи в формат для API
-        products = []
-        for task in tasks:
-            products.append(ProductInfo(
-                barcode=task.barcode,
-                quantity=task.quantity
-            ))
-        
-        # Получаем доступные слоты для товаров
-        try:
-            slots = await self.wb_api.check_acceptance_options(products)
-        except Exception as e:
-            logger.error(f"❌ Ошибка API запроса опций приемки: {e}")
-            return
-        
-        # Собираем все уникальные ID складов из доступных слотов
-        all_warehouse_ids = set()
-        for slot in slots:
-            if not slot.is_error and slot.warehouses:
-                for warehouse in slot.warehouses:
-                    all_warehouse_ids.add(warehouse.warehouse_id)
-        
-        if not all_warehouse_ids:
-            logger.info("ℹ️ Нет доступных складов для данной группы товаров")
-            return
-        
-        # Получаем коэффициенты приемки для найденных складов
-        try:
-            logger.info(f"📊 Получаем коэффициенты для {len(all_warehouse_ids)} складов")
-            coefficients = await self.wb_api.get_acceptance_coefficients(list(all_warehouse_ids))
-        except Exception as e:
-            logger.error(f"❌ Ошибка получения коэффициентов: {e}")
-            return
-        
-        # Создаем индекс коэффициентов по складу и дате для быстрого поиска
-        coef_index = {}
-        for coef in coefficients:
-            key = (coef.warehouse_id, coef.date.date(), coef.box_type_id)
-            coef_index[key] = coef
-        
-        # Анализируем каждый товар
-        for slot in slots:
-            if slot.is_error:
-                logger.warning(f"⚠️ Ошибка для товара {slot.barcode}: {slot.error}")
-                continue
+        async with self._group_semaphore:
+            # Конвертируем задачи в формат для API
+            products = []
+            for task in tasks:
+                products.append(ProductInfo(
+                    barcode=task.barcode,
+                    quantity=task.quantity
+                ))
             
-            # Находим соответствующую задачу по баркоду
-            task = next((t for t in tasks if t.barcode == slot.barcode), None)
-            if not task:
-                logger.warning(f"⚠️ Не найдена задача для товара {slot.barcode}")
-                continue
+            # Индекс задач по баркоду для быстрого сопоставления с ответом API
+            # (при повторе баркода побеждает первая задача, как и раньше)
+            task_by_barcode = {task.barcode: task for task in reversed(tasks)}
             
-            # Ищем подходящие слоты для этого товара
-            suitable_slots = self._find_suitable_slots_with_coefficients(
-                slot, task, coef_index
-            )
+            # Получаем доступные слоты для товаров
+            try:
+                slots = await self.wb_api.check_acceptance_options(products)
+            except Exception as e:
+                logger.error(f"❌ Ошибка API запроса опций приемки: {e}")
+                return None
+            
+            # Собираем все уникальные ID складов из доступных слотов
+            all_warehouse_ids = set()
+            for slot in slots:
+                if not slot.is_error and slot.warehouses:
+                    for warehouse in slot.warehouses:
+                        all_warehouse_ids.add(warehouse.warehouse_id)
             
-            if suitable_slots:
-                logger.info(f"🎯 Найдено {len(suitable_slots)} подходящих слотов для {slot.barcode}")
+            if not all_warehouse_ids:
+                logger.info("ℹ️ Нет доступных складов для данной группы товаров")
+                return []
+            
+            self._cycle_warehouses |= all_warehouse_ids
+            
+            # Получаем коэффициенты приемки для найденных складов: берем заранее
+            # запрошенные и дозапрашиваем только склады, которых в них нет
+            coefficients: List[AcceptanceCoefficient] = []
+            missing_warehouse_ids = all_warehouse_ids
+            if prewarm is not None:
+                try:
+                    coefficients = await asyncio.shield(prewarm[1])
+                    missing_warehouse_ids = all_warehouse_ids - prewarm[0]
+                except Exception as e:
+                    logger.warning(f"⚠️ Заранее запрошенные коэффициенты недоступны: {e}")
+            
+            if missing_warehouse_ids:
+                try:
+                    logger.info(f"📊 Получаем коэффициенты для {len(missing_warehouse_ids)} складов")
+                    # Новый список: результат prewarm общий для всех групп цикла
+                    coefficients = coefficients + await self._get_coefficients(missing_warehouse_ids)
+                except Exception as e:
+                    logger.error(f"❌ Ошибка получения коэффициентов: {e}")
+                    return None
+            
+            # Группируем коэффициенты по складу (внутри склада - по возрастанию даты)
+            coef_by_warehouse: Dict[int, List[AcceptanceCoefficient]] = defaultdict(list)
+            for coef in coefficients:
+                coef_by_warehouse[coef.warehouse_id].append(coef)
+            for warehouse_coefs in coef_by_warehouse.values():
+                warehouse_coefs.sort(key=lambda c: c.date)
+            
+            # Даты коэффициентов по складу - для поиска окна дат задачи через bisect
+            dates_by_warehouse: Dict[int, List[date]] = {
+                warehouse_id: [coef.date.date() for coef in warehouse_coefs]
+                for warehouse_id, warehouse_coefs in coef_by_warehouse.items()
+            }
+            
+            # Анализируем каждый товар
+            group_slots: List[FoundSlot] = []
+            for slot in slots:
+                if slot.is_error:
+                    logger.warning(f"⚠️ Ошибка для товара {slot.barcode}: {slot.error}")
+                    continue
+                
+                # Находим соответствующую задачу по баркоду
+                task = task_by_barcode.get(slot.barcode)
+                if not task:
+                    logger.warning(f"⚠️ Не найдена задача для товара {slot.barcode}")
+                    continue
                 
-                # Отправляем уведомления
-                await self._notify_about_found_slots(suitable_slots)
+                # Ищем подходящие слоты для этого товара
+                suitable_slots = self._find_suitable_slots_with_coefficients(
+                    slot, task, coef_by_warehouse, dates_by_warehouse
+                )
+                
+                if suitable_slots:
+                    logger.info(f"🎯 Найдено {len(suitable_slots)} подходящих слотов для {slot.barcode}")
+                    group_slots.extend(suitable_slots)
+            
+            return group_slots
+    
+    async def _get_coefficients(self, warehouse_ids) -> List[AcceptanceCoefficient]:
+        """
+        Запрашивает коэффициенты приемки для складов
+        Первый запрос цикла покрыт токеном cycle_limiter, взятым на сам цикл. В адаптивном режиме
+        limiter рассчитан ровно на лимит коэффициентов, поэтому каждый следующий запрос цикла
+        ждет свой токен (в фиксированном режиме хватает паузы клиента WB API)
+        """
+        if self._cycle_coefficient_requests and config.enable_adaptive_monitoring:
+            await self.cycle_limiter.wait()
+        self._cycle_coefficient_requests += 1
+        return await self.wb_api.get_acceptance_coefficients(list(warehouse_ids))
     
     def _find_suitable_slots_with_coefficients(self, slot: SlotInfo, task: MonitoringTask, 
-                                              coef_index: Dict) -> List[FoundSlot]:
+                                              coef_by_warehouse: Dict[int, List[AcceptanceCoefficient]],
+                                              dates_by_warehouse: Dict[int, List[date]]) -> List[FoundSlot]:
         """
         Находит подходящие слоты с учетом коэффициентов приемки и критериев задачи
+        Перебирает только коэффициенты, реально пришедшие от API для складов товара,
+        и только в окне дат задачи (коэффициенты склада отсортированы по дате)
         
         Фильтрация по типам упаковки:
         - Коледино (ID: 507) и Щербинка (ID: 336442) - только монопаллеты (box_type_id = 2)
@@ -349,6 +520,10 @@ class SlotMonitor:
         """
         suitable_slots = []
         
+        # Диапазон дат задачи, начиная не раньше сегодняшнего дня
+        start_date = max(task.date_from, datetime.now().date())
+        end_date = task.date_to
+        
         for warehouse in slot.warehouses:
             warehouse_id = warehouse.warehouse_id
             
@@ -356,50 +531,45 @@ class SlotMonitor:
             if task.allowed_warehouses and warehouse_id not in task.allowed_warehouses:
                 continue
             
-            # Ищем коэффициенты для этого склада в разрешенном диапазоне дат
-            current_date = datetime.now().date()
-            
-            # Проверяем каждый день в диапазоне задачи
-            check_date = max(task.date_from, current_date)
-            end_date = task.date_to
-            
-            while check_date <= end_date:
-                # Определяем разрешенные типы упаковки в зависимости от склада
-                # Коледино (507) и Щербинка (336442) - только монопаллеты (box_type_id = 2)
-                # Остальные склады - только короба (box_type_id = 1)
-                if warehouse_id in [507, 336442]:  # Коледино и Щербинка
-                    allowed_box_types = [2]  # Только монопаллеты
-                else:
-                    allowed_box_types = [1]  # Только короба
+            # Определяем разрешенный тип упаковки в зависимости от склада
+            if warehouse_id in MONOPALLET_ONLY_WAREHOUSES:
+                allowed_box_type = 2  # Только монопаллеты
+            else:
+                allowed_box_type = 1  # Только короба
+            
+            warehouse_coefs = coef_by_warehouse.get(warehouse_id)
+            if not warehouse_coefs:
+                continue
+            
+            warehouse_dates = dates_by_warehouse[warehouse_id]
+            lo = bisect_left(warehouse_dates, start_date)
+            hi = bisect_right(warehouse_dates, end_date)
+            
+            for coef in warehouse_coefs[lo:hi]:
+                if coef.box_type_id != allowed_box_type:
+                    continue
                 
-                # Проверяем разрешенные типы упаковки для данного склада
-                for box_type_id in allowed_box_types:
-                    coef_key = (warehouse_id, check_date, box_type_id)
-                    
-                    if coef_key in coef_index:
-                        coef = coef_index[coef_key]
-                        
-                        # Проверяем все критерии
-                        if (coef.is_slot_available() and  # Слот доступен (коэф 0-1 + allowUnload)
-                            coef.coefficient <= task.max_coefficient and  # Коэффициент в пределах лимита
-                            check_date >= task.date_from and check_date <= task.date_to):  # Дата подходит
-                            
-                            found_slot = FoundSlot(
-                                barcode=slot.barcode,
-                                warehouse_id=warehouse_id,
-                                warehouse_name=coef.warehouse_name,
-                                coefficient=coef.coefficient,
-                                box_type_name=coef.box_type_name,
-                                date=coef.date,
-                                allow_unload=coef.allow_unload,
-                                found_at=datetime.now(),
-                                monitoring_task=task
-                            )
-                            
-                            suitable_slots.append(found_slot)
+                # Склад, тип упаковки и дата уже подходят, остается лимит коэффициента
+                # и доступность (коэф 0-1 + allowUnload)
+                if not (coef.coefficient <= task.max_coefficient and
+                        coef.is_slot_available()):
+                    continue
+                
+                # Все критерии задачи проверены здесь, повторно в to_dict не считаем
+                found_slot = FoundSlot(
+                    barcode=slot.barcode,
+                    warehouse_id=warehouse_id,
+                    warehouse_name=coef.warehouse_name,
+                    coefficient=coef.coefficient,
+                    box_type_name=coef.box_type_name,
+                    date=coef.date,
+                    allow_unload=coef.allow_unload,
+                    found_at=datetime.now(),
+                    monitoring_task=task,
+                    prechecked=True
+                )
                 
-                # Переходим к следующему дню
-                check_date = check_date + timedelta(days=1)
+                suitable_slots.append(found_slot)
         
         return suitable_slots
     
@@ -410,19 +580,21 @@ class SlotMonitor:
         if not found_slots:
             return
         
-        # Конвертируем найденные слоты в формат для сравнения
+        # Конвертируем найденные слоты в формат для сохранения и отправки
         new_slots_data = [slot.to_dict() for slot in found_slots]
+        new_keys = frozenset(slot.slot_key for slot in found_slots)
         
         # Проверяем, изменились ли слоты
-        if self._slots_changed(new_slots_data):
+        if self._slots_changed(new_keys):
             logger.info(f"📊 Слоты изменились, обновляем активные слоты")
             
             # Получаем только новые слоты для существующих пользователей
-            new_only_slots = self._get_new_slots(new_slots_data)
+            new_only_slots = self._get_new_slots(found_slots, new_slots_data)
             
-            # Обновляем актуальные слоты
+            # Обновляем актуальные слоты (файл переписываем только при изменении набора)
             self.current_active_slots = new_slots_data
-            self._save_active_slots(new_slots_data)
+            self.current_active_keys = new_keys
+            await self._save_active_slots(new_slots_data)
             
             # Отправляем уведомления только о новых слотах существующим пользователям
             if new_only_slots:
@@ -438,23 +610,35 @@ class SlotMonitor:
         
         # Обновляем статистику
         for slot in found_slots:
-            slot_key = f"{slot.barcode}_{slot.warehouse_id}_{slot.date.date()}_{slot.box_type_name}"
-            if slot_key not in self.notified_slots:
-                self.notified_slots.add(slot_key)
+            if self.notified_slots.add(slot.notify_key):
                 self.stats["slots_found"] += 1
                 
                 # Сохраняем информацию о найденном слоте для аналитики
                 await self._save_found_slot(slot)
     
     async def _send_new_slots_to_existing_users(self, new_slots: List[Dict[str, Any]]):
-        """Отправляет новые слоты существующим пользователям"""
-        for slot_data in new_slots:
-            try:
-                from telegram_bot import send_slot_notification
+        """
+        Отправляет новые слоты существующим пользователям
+        Уведомления уходят параллельно, не более 20 одновременно
+        """
+        from telegram_bot import send_slot_notification
+        
+        semaphore = asyncio.Semaphore(20)
+        
+        async def send_one(slot_data: Dict[str, Any]):
+            async with semaphore:
                 await send_slot_notification(slot_data)
+        
+        results = await asyncio.gather(
+            *(send_one(slot_data) for slot_data in new_slots),
+            return_exceptions=True
+        )
+        
+        for slot_data, result in zip(new_slots, results):
+            if isinstance(result, Exception):
+                logger.error(f"❌ Ошибка отправки уведомления о новом слоте: {result}")
+            else:
                 logger.info(f"✅ Уведомление о новом слоте отправлено: {slot_data['barcode']}")
-            except Exception as e:
-                logger.error(f"❌ Ошибка отправки уведомления о новом слоте: {e}")
     
     async def _send_active_slots_to_new_users(self, active_slots: List[Dict[str, Any]]):
         """Подготавливает активные слоты для новых пользователей"""
@@ -510,29 +694,16 @@ class SlotMonitor:
         Сохраняет информацию о найденном слоте для аналитики и истории
         """
         try:
-            # Создаем папку для сохранения если ее нет
-            import os
-            os.makedirs("found_slots", exist_ok=True)
-            
             # Формируем имя файла с датой
-            filename = f"found_slots/slots_{datetime.now().strftime('%Y-%m-%d')}.json"
+            filename = found_slots_filename(datetime.now())
             
-            # Читаем существующие данные или создаем новый список
-            import json
-            slots_data = []
+            def append():
+                # Создаем папку для сохранения если ее нет
+                os.makedirs("found_slots", exist_ok=True)
+                # Дописываем слот отдельной строкой, не перечитывая файл
+                append_json_line(filename, slot.to_dict())
             
-            try:
-                with open(filename, "r", encoding="utf-8") as f:
-                    slots_data = json.load(f)
-            except FileNotFoundError:
-                pass  # Файл не существует, создаем новый
-            
-            # Добавляем новый слот
-            slots_data.append(slot.to_dict())
-            
-            # Сохраняем обновленные данные
-            with open(filename, "w", encoding="utf-8") as f:
-                json.dump(slots_data, f, ensure_ascii=False, indent=2)
+            await asyncio.to_thread(append)
             
             logger.debug(f"💾 Слот сохранен в {filename}")
             
@@ -543,63 +714,50 @@ class SlotMonitor:
         """Загружает текущие активные слоты из файла"""
         try:
             if os.path.exists(self.active_slots_file):
-                with open(self.active_slots_file, "r", encoding="utf-8") as f:
-                    slots_data = json.load(f)
-                    self.current_active_slots = slots_data
-                    logger.info(f"📥 Загружено {len(self.current_active_slots)} активных слотов")
+                slots_data = load_json_file(self.active_slots_file)
+                self.current_active_slots = slots_data
+                self.current_active_keys = frozenset(_active_slot_key(slot) for slot in slots_data)
+                logger.info(f"📥 Загружено {len(self.current_active_slots)} активных слотов")
             else:
                 logger.info("📂 Файл активных слотов не найден, начинаем с пустого списка")
         except Exception as e:
             logger.warning(f"⚠️ Ошибка загрузки активных слотов: {e}")
             self.current_active_slots = []
+            self.current_active_keys = frozenset()
     
-    def _save_active_slots(self, slots: List[Dict[str, Any]]):
-        """Сохраняет текущие активные слоты в файл"""
+    async def _save_active_slots(self, slots: List[Dict[str, Any]]):
+        """
+        Сохраняет текущие активные слоты в файл
+        Пишет во временный файл и атомарно подменяет, чтобы бот не прочитал файл наполовину
+        Запись идет в отдельном потоке, чтобы не блокировать event loop
+        """
+        tmp_file = self.active_slots_file + ".tmp"
+        
+        def write():
+            dump_json_file(tmp_file, slots)
+            os.replace(tmp_file, self.active_slots_file)
+        
         try:
-            with open(self.active_slots_file, "w", encoding="utf-8") as f:
-                json.dump(slots, f, ensure_ascii=False, indent=2)
+            async with self._active_slots_lock:
+                await asyncio.to_thread(write)
             logger.debug(f"💾 Сохранено {len(slots)} активных слотов")
         except Exception as e:
             logger.warning(f"⚠️ Ошибка сохранения активных слотов: {e}")
     
-    def _slots_changed(self, new_slots: List[Dict[str, Any]]) -> bool:
+    def _slots_changed(self, new_keys: frozenset) -> bool:
         """Проверяет, изменились ли слоты по сравнению с предыдущим циклом"""
-        if len(new_slots) != len(self.current_active_slots):
-            return True
-        
-        # Создаем множества для сравнения (исключаем found_at из сравнения)
-        current_keys = set()
-        new_keys = set()
-        
-        for slot in self.current_active_slots:
-            key = f"{slot['barcode']}_{slot['warehouse_id']}_{slot['date']}_{slot['box_type_name']}_{slot['coefficient']}"
-            current_keys.add(key)
-        
-        for slot in new_slots:
-            key = f"{slot['barcode']}_{slot['warehouse_id']}_{slot['date']}_{slot['box_type_name']}_{slot['coefficient']}"
-            new_keys.add(key)
-        
-        return current_keys != new_keys
+        return new_keys != self.current_active_keys
     
-    def _get_new_slots(self, new_slots: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    def _get_new_slots(self, found_slots: List[FoundSlot],
+                       new_slots: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """Возвращает только новые слоты (которых не было в предыдущем цикле)"""
-        if not self.current_active_slots:
+        if not self.current_active_keys:
             return new_slots
         
-        # Создаем множество текущих слотов (исключаем found_at из сравнения)
-        current_keys = set()
-        for slot in self.current_active_slots:
-            key = f"{slot['barcode']}_{slot['warehouse_id']}_{slot['date']}_{slot['box_type_name']}_{slot['coefficient']}"
-            current_keys.add(key)
-        
-        # Находим новые слоты
-        new_only = []
-        for slot in new_slots:
-            key = f"{slot['barcode']}_{slot['warehouse_id']}_{slot['date']}_{slot['box_type_name']}_{slot['coefficient']}"
-            if key not in current_keys:
-                new_only.append(slot)
-        
-        return new_only
+        return [
+            slot_data for slot, slot_data in zip(found_slots, new_slots)
+            if slot.slot_key not in self.current_active_keys
+        ]
     
     def get_current_active_slots(self) -> List[Dict[str, Any]]:
         """Возвращает текущие активные слоты для новых пользователей"""
@@ -610,10 +768,6 @@ class SlotMonitor:
         Возвращает статистику найденных слотов за разные периоды
         """
         try:
-            import os
-            import json
-            from datetime import date, timedelta
-            
             stats = {
                 "today": 0,
                 "yesterday": 0,
@@ -626,46 +780,50 @@ class SlotMonitor:
             # Анализируем файлы за последние 7 дней
             today = date.today()
             
-            for days_back in range(7):
-                check_date = today - timedelta(days=days_back)
-                filename = f"found_slots/slots_{check_date.strftime('%Y-%m-%d')}.json"
+            top_warehouses = Counter()
+            
+            filenames = [found_slots_filename(today - timedelta(days=days_back)) for days_back in range(7)]
+            
+            # Файлы читаем и разбираем в потоках, чтобы не блокировать event loop
+            results = await asyncio.gather(
+                *(asyncio.to_thread(_read_day_stats, filename) for filename in filenames),
+                return_exceptions=True
+            )
+            
+            for days_back, (filename, day_stats) in enumerate(zip(filenames, results)):
+                if day_stats is None:
+                    continue
                 
-                if os.path.exists(filename):
-                    try:
-                        with open(filename, "r", encoding="utf-8") as f:
-                            day_slots = json.load(f)
-                        
-                        count = len(day_slots)
-                        stats["total"] += count
-                        stats["this_week"] += count
-                        
-                        if days_back == 0:
-                            stats["today"] = count
-                        elif days_back == 1:
-                            stats["yesterday"] = count
-                        
-                        # Анализируем коэффициенты и склады
-                        for slot_data in day_slots:
-                            coef = slot_data.get("coefficient", -1)
-                            warehouse_name = slot_data.get("warehouse_name", "Неизвестно")
-                            
-                            if coef >= 0:
-                                stats["best_coefficients"].append(coef)
+                try:
+                    if isinstance(day_stats, Exception):
+                        raise day_stats
+                    
+                    count, coefficients, warehouses = day_stats
+                    
+                    stats["total"] += count
+                    stats["this_week"] += count
+                    
+                    if days_back == 0:
+                        stats["today"] = count
+                    elif days_back == 1:
+                        stats["yesterday"] = count
+                    
+                    stats["best_coefficients"].extend(coefficients)
+                    top_warehouses.update(warehouses)
                             
-                            if warehouse_name in stats["top_warehouses"]:
-                                stats["top_warehouses"][warehouse_name] += 1
-                            else:
-                                stats["top_warehouses"][warehouse_name] = 1
-                                
-                    except Exception as e:
-                        logger.warning(f"⚠️ Ошибка чтения {filename}: {e}")
+                except Exception as e:
+                    logger.warning(f"⚠️ Ошибка чтения {filename}: {e}")
+            
+            stats["top_warehouses"] = dict(top_warehouses)
             
             # Обрабатываем статистику коэффициентов
-            if stats["best_coefficients"]:
-                stats["best_coefficients"].sort()
-                stats["avg_coefficient"] = sum(stats["best_coefficients"]) / len(stats["best_coefficients"])
-                stats["min_coefficient"] = min(stats["best_coefficients"])
-                stats["max_coefficient"] = max(stats["best_coefficients"])
+            # (после сортировки минимум и максимум - крайние элементы)
+            coefficients = stats["best_coefficients"]
+            if coefficients:
+                coefficients.sort()
+                stats["avg_coefficient"] = sum(coefficients) / len(coefficients)
+                stats["min_coefficient"] = coefficients[0]
+                stats["max_coefficient"] = coefficients[-1]
             
             return stats
             
@@ -697,11 +855,12 @@ async def quick_test():
     
     # Тестируем Google Sheets (если доступно)
     try:
-        tasks = monitor.sheets_parser.get_monitoring_tasks()
+        tasks = await monitor.sheets_parser.get_monitoring_tasks()
         logger.info(f"✅ Google Sheets: загружено {len(tasks)} задач")
     except Exception as e:
         logger.warning(f"⚠️ Google Sheets недоступен: {e}")
     
+    await monitor.wb_api.close()
     logger.info("🧪 Тест завершен")
 
 
@@ -712,7 +871,7 @@ async def main():
     """
     # Настройка логирования
     logging.basicConfig(
-        level=getattr(logging, config.log_level),
+        level=config.log_level_int,
         format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
         handlers=[
             logging.FileHandler(config.log_file),
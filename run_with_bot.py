@@ -6,35 +6,50 @@
 
 import asyncio
 import logging
+import logging.handlers
+import queue
 import signal
-import sys
-from pathlib import Path
-
-# Добавляем текущую папку в PYTHONPATH
-sys.path.insert(0, str(Path(__file__).parent))
+from typing import Optional, Set
 
 from config import config
-from monitor import SlotMonitor
-from telegram_bot import initialize_bot
+
+try:
+    import uvloop
+except ImportError:
+    uvloop = None  # uvloop не установлен (например, на Windows) - используем стандартный loop
 
 logger = logging.getLogger(__name__)
 
 
+class _TaskFinished(Exception):
+    """Одна из задач системы завершилась - остальные нужно остановить"""
+
+
 class WBSlotsSystem:
     """Основной класс для управления всей системой мониторинга"""
     
     def __init__(self):
+        # Монитор и бот тянут aiohttp/aiogram/gspread - импортируем их только после
+        # проверки конфигурации, когда система действительно запускается
+        from monitor import SlotMonitor
+        
         self.monitor = SlotMonitor()
         self.telegram_bot = None
         self.running = False
-        self.tasks = []
+        self.tasks: Set[asyncio.Task] = set()
+        self._stop_task: Optional[asyncio.Task] = None  # Задача остановки, запущенная обработчиком сигнала
+        self._shutting_down = False
+        self._loop: Optional[asyncio.AbstractEventLoop] = None  # Loop, на котором висят обработчики сигналов
     
     async def start_system(self):
         """Запускает всю систему мониторинга"""
         logger.info("🚀 Запуск системы мониторинга WB Slots с Telegram ботом")
         
-        # Инициализируем Telegram бота
-        self.telegram_bot = await initialize_bot()
+        from telegram_bot import initialize_bot
+        
+        # Инициализируем Telegram бота с максимальным long polling:
+        # пустые getUpdates повторяются реже, а сообщения приходят сразу
+        self.telegram_bot = await initialize_bot(long_poll_timeout=50)
         if self.telegram_bot:
             logger.info("✅ Telegram бот инициализирован")
         else:
@@ -43,91 +58,99 @@ class WBSlotsSystem:
         self.running = True
         
         try:
-            # Создаем задачи для параллельного выполнения
-            tasks = []
-            
-            # Задача мониторинга слотов
-            monitoring_task = asyncio.create_task(
-                self.monitor.start_monitoring(),
-                name="monitoring"
-            )
-            tasks.append(monitoring_task)
-            
-            # Задача Telegram бота (если инициализирован)
-            if self.telegram_bot:
-                bot_task = asyncio.create_task(
-                    self.telegram_bot.start_polling(),
-                    name="telegram_bot"
-                )
-                tasks.append(bot_task)
-            
-            self.tasks = tasks
-            
-            # Ждем завершения любой из задач
-            logger.info(f"🔄 Запущено {len(tasks)} задач...")
-            done, pending = await asyncio.wait(
-                tasks,
-                return_when=asyncio.FIRST_COMPLETED
-            )
-            
-            # Если одна из задач завершилась, останавливаем остальные
-            logger.info("⚠️ Одна из задач завершилась, останавливаем систему...")
-            
-            for task in pending:
-                task.cancel()
-                try:
-                    await task
-                except asyncio.CancelledError:
-                    pass
-            
-            # Проверяем результаты завершенных задач
-            for task in done:
-                try:
-                    result = await task
-                    logger.info(f"✅ Задача {task.get_name()} завершена успешно")
-                except Exception as e:
-                    logger.error(f"❌ Задача {task.get_name()} завершена с ошибкой: {e}")
+            # TaskGroup сам отменит остальные задачи, когда одна из них завершится:
+            # _run_supervised превращает любое завершение задачи в _TaskFinished
+            async with asyncio.TaskGroup() as tg:
+                tasks: Set[asyncio.Task] = set()
+                
+                # Задача мониторинга слотов
+                tasks.add(tg.create_task(
+                    self._run_supervised("monitoring", self.monitor.start_monitoring()),
+                    name="monitoring"
+                ))
+                
+                # Задача Telegram бота (если инициализирован)
+                if self.telegram_bot:
+                    tasks.add(tg.create_task(
+                        # Сигналы обрабатывает WBSlotsSystem, поэтому aiogram свои не ставит
+                        self._run_supervised(
+                            "telegram_bot",
+                            self.telegram_bot.start_polling(handle_signals=False)
+                        ),
+                        name="telegram_bot"
+                    ))
+                
+                self.tasks = tasks
+                logger.info(f"🔄 Запущено {len(tasks)} задач...")
         
-        except Exception as e:
-            logger.error(f"❌ Ошибка в системе мониторинга: {e}")
-            raise
+        except* _TaskFinished:
+            logger.info("⚠️ Одна из задач завершилась, система остановлена")
         finally:
             self.running = False
     
-    async def stop_system(self):
-        """Останавливает систему мониторинга"""
-        if self.running:
-            logger.info("🛑 Остановка системы мониторинга...")
-            
-            # Отменяем все задачи
-            for task in self.tasks:
-                if not task.done():
-                    task.cancel()
-            
-            # Останавливаем Telegram бота
-            if self.telegram_bot:
-                await self.telegram_bot.stop()
-            
-            self.running = False
-            logger.info("✅ Система остановлена")
+    async def _run_supervised(self, name: str, coro):
+        """Выполняет задачу системы и сообщает группе о ее завершении"""
+        try:
+            await coro
+            logger.info(f"✅ Задача {name} завершена успешно")
+        except Exception as e:
+            logger.error(f"❌ Задача {name} завершена с ошибкой: {e}")
+        raise _TaskFinished(name)
     
-    def setup_signal_handlers(self):
-        """Настраивает обработчики сигналов для корректного завершения"""
-        def signal_handler(signum, frame):
-            logger.info(f"Получен сигнал {signum}, завершаем работу...")
-            asyncio.create_task(self.stop_system())
+    async def stop_system(self):
+        """
+        Останавливает систему мониторинга
+        Выполняется один раз: повторный вызов только дожидается уже идущей остановки
+        """
+        if self._shutting_down:
+            if self._stop_task is not None and self._stop_task is not asyncio.current_task():
+                await self._stop_task
+            return
+        self._shutting_down = True
+        
+        logger.info("🛑 Остановка системы мониторинга...")
         
-        signal.signal(signal.SIGINT, signal_handler)
-        signal.signal(signal.SIGTERM, signal_handler)
+        # Отменяем задачи, которые еще работают (TaskGroup в start_system дождется их)
+        for task in self.tasks:
+            if not task.done():
+                task.cancel()
+        
+        # Останавливаем Telegram бота
+        if self.telegram_bot:
+            await self.telegram_bot.stop()
+        
+        self.running = False
+        logger.info("✅ Система остановлена")
+    
+    def _on_signal(self, signum: int):
+        """Обработчик SIGINT/SIGTERM: запускает остановку системы"""
+        logger.info(f"Получен сигнал {signum}, завершаем работу...")
+        # Повторный сигнал во время остановки не запускает вторую остановку
+        if self._stop_task is None or self._stop_task.done():
+            self._stop_task = self._loop.create_task(self.stop_system())
+    
+    def setup_signal_handlers(self, loop: Optional[asyncio.AbstractEventLoop] = None):
+        """
+        Настраивает обработчики сигналов для корректного завершения
+        Должен вызываться внутри работающего event loop (или получить его в loop)
+        """
+        if loop is None:
+            loop = asyncio.get_running_loop()
+        self._loop = loop
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(signum, self._on_signal, signum)
     
     async def get_system_status(self):
         """Возвращает статус системы"""
-        monitor_stats = await self.monitor.get_statistics()
-        
         if self.telegram_bot:
             from telegram_bot import get_bot_stats
-            bot_stats = await get_bot_stats()
+            # Статистика монитора и бота независимы - собираем параллельно
+            monitor_stats, bot_stats = await asyncio.gather(
+                self.monitor.get_statistics(),
+                get_bot_stats()
+            )
         else:
+            monitor_stats = await self.monitor.get_statistics()
             bot_stats = {"error": "Бот не инициализирован"}
         
         return {
@@ -140,16 +163,37 @@ class WBSlotsSystem:
 
 async def main():
     """Основная функция"""
-    # Настройка логирования
+    # Настройка логирования: запись в файл и консоль идет в отдельном потоке
+    # через очередь, чтобы не блокировать event loop
+    formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    file_handler = logging.FileHandler(config.log_file)
+    stream_handler = logging.StreamHandler()
+    file_handler.setFormatter(formatter)
+    stream_handler.setFormatter(formatter)
+    
+    log_queue = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(log_queue, file_handler, stream_handler)
     logging.basicConfig(
-        level=getattr(logging, config.log_level),
-        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        handlers=[
-            logging.FileHandler(config.log_file),
-            logging.StreamHandler()
-        ]
+        level=config.log_level_int,
+        handlers=[logging.handlers.QueueHandler(log_queue)]
     )
+    logger.setLevel(config.log_level_int)
     
+    # Формат логов не использует поток/процесс/задачу - не собираем их в каждую запись
+    logging.logThreads = False
+    logging.logProcesses = False
+    logging.logMultiprocessing = False
+    logging.logAsyncioTasks = False
+    listener.start()
+    
+    try:
+        await run_system()
+    finally:
+        listener.stop()
+
+
+async def run_system():
+    """Запускает систему мониторинга и ждет ее завершения"""
     logger.info("=" * 60)
     logger.info("🚀 WB SLOTS MONITOR WITH TELEGRAM BOT STARTED")
     logger.info("=" * 60)
@@ -161,7 +205,7 @@ async def main():
     
     # Создаем и запускаем систему
     system = WBSlotsSystem()
-    system.setup_signal_handlers()
+    system.setup_signal_handlers(asyncio.get_running_loop())
     
     try:
         await system.start_system()
@@ -175,4 +219,7 @@ async def main():
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    if uvloop is not None:
+        uvloop.run(main())
+    else:
+        asyncio.run(main())
\ No newline at end of file
@@ -5,57 +5,207 @@
 """
 import asyncio
 import gspread
-import os
 from google.oauth2.service_account import Credentials
-from typing import List, Dict, Any, Optional
-from dataclasses import dataclass
+from google.auth.transport.requests import AuthorizedSession
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from typing import List, Dict, Any, Optional, Tuple
+from dataclasses import dataclass, field
+from functools import wraps
+from operator import itemgetter
 from datetime import datetime, date, timedelta
+import hashlib
 import logging
+import os
+import random
 import re
 import time
 from gspread.exceptions import APIError
-
-# Load environment variables first
-try:
-    from dotenv import load_dotenv
-    load_dotenv(override=True)
-except ImportError:
-    pass
+from gspread.utils import absolute_range_name, fill_gaps
 
 from wb_api import WildberriesAPI
 from config import config
-
-# Update config with environment variables
-config.wb_api_key = os.getenv("WB_API_KEY", config.wb_api_key)
-config.google_sheets_url = os.getenv("GOOGLE_SHEETS_URL", config.google_sheets_url)
+from slot_utils import load_json_file, dump_json_file
 
 logger = logging.getLogger(__name__)
 
+# Даты вида DD.MM.YYYY, DD/MM/YY, DD.MM - разделитель внутри даты одинаковый
+_DATE_RE = re.compile(r'^(\d{1,2})([./])(\d{1,2})(?:\2(\d{4}|\d{2}))?$')
+# Дата в ISO формате YYYY-MM-DD
+_ISO_DATE_RE = re.compile(r'^(\d{4})-(\d{1,2})-(\d{1,2})$')
+
+# Разделители ID складов в табличном формате и значения "все склады"
+_WAREHOUSE_SPLIT_RE = re.compile(r'[,;|]')
+_ALL_MARKERS = frozenset({"все", "all", "любые", "*"})
+
+# ID таблицы в URL: /spreadsheets/d/<id>, /d/<id> или key=<id>
+_SHEET_ID_RE = re.compile(r'(?:/spreadsheets/d/|/d/|key=)([a-zA-Z0-9_-]+)')
+
+# Приоритет типов совпадения названия склада (меньше - лучше)
+_MATCH_RANK = {'exact': 0, 'target_in_warehouse': 1, 'city_match': 2, 'warehouse_in_target': 3}
+
+# Значения ячеек читаем без форматирования: числа приходят числами, даты - серийными номерами
+_VALUE_RENDER_PARAMS = {
+    'valueRenderOption': 'UNFORMATTED_VALUE',
+    'dateTimeRenderOption': 'SERIAL_NUMBER',
+}
+# Нулевой день серийных дат Google Sheets
+_SHEETS_EPOCH = date(1899, 12, 30)
+
+
+# Сколько живут список складов WB и сопоставления названий из B4 с ID (как кэш задач - 2 минуты)
+_WAREHOUSES_CACHE_TTL = 120
+
+# Сколько живет список листов таблицы: структура меняется редко, а значения ячеек
+# читаются заново при каждом изменении таблицы
+_WORKSHEETS_CACHE_TTL = 120
+
+# Строки с задачами в формате ячеек: баркод и количество в B8:C100
+_DATA_FIRST_ROW = 8
+_DATA_LAST_ROW = 100
+
+# Ключевые слова заголовков старого табличного формата: поле задачи -> возможные названия
+_COLUMN_KEYWORDS = {
+    "barcode": ["баркод", "штрихкод", "barcode", "штрих-код", "код товара"],
+    "quantity": ["количество", "кол-во", "quantity", "шт", "штук"],
+    "warehouses": ["склады", "склад", "warehouses", "warehouse", "wh"],
+    "max_coefficient": ["коэффициент", "коэф", "coefficient", "макс коэф", "max_coef"],
+    "date_from": ["дата с", "с даты", "from", "начало", "date_from"],
+    "date_to": ["дата до", "до даты", "to", "конец", "date_to"],
+    "active": ["активно", "active", "включено", "enabled"]
+}
+
+# Каталог дискового кэша задач: переживает перезапуск, пока таблица не менялась
+_TASKS_DISK_CACHE_DIR = "data"
+
+# HTTP-коды ответов Google API, после которых запрос имеет смысл повторить
+_RETRYABLE_API_CODES = frozenset({429, 500, 502, 503, 504})
+
+
+def _is_retryable_api_error(error: APIError) -> bool:
+    """Ошибка лимита (429, Quota exceeded) или временная ошибка сервера Google"""
+    return error.code in _RETRYABLE_API_CODES or "Quota exceeded" in str(error)
+
+
+def _retry_on_api_limit(max_attempts: int = 4, initial_delay: float = 2.0, max_delay: float = 30.0):
+    """
+    Декоратор для синхронных вызовов Google Sheets API: при лимите или временной ошибке
+    повторяет вызов с экспоненциальной паузой и случайным джиттером
+    Повторяется только сам вызов, а не все чтение таблицы
+    Для методов парсера число повторов копится в api_retry_count
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(self, *args, **kwargs):
+            for attempt in range(1, max_attempts + 1):
+                try:
+                    return func(self, *args, **kwargs)
+                except APIError as e:
+                    if not _is_retryable_api_error(e):
+                        raise
+                    if attempt == max_attempts:
+                        logger.error(f"❌ Превышен лимит API после всех попыток ({func.__name__})")
+                        raise
+                    self.api_retry_count += 1
+                    wait_time = min(max_delay, initial_delay * 2 ** (attempt - 1)) + random.uniform(0, initial_delay)
+                    logger.warning(f"⏳ Превышен лимит API ({func.__name__}), ждем {wait_time:.1f} секунд перед повтором (попытка {attempt}/{max_attempts})")
+                    time.sleep(wait_time)
+        return wrapper
+    return decorator
+
+
+def _match_columns(headers: List[str]) -> Dict[str, int]:
+    """Сопоставляет заголовки (в нижнем регистре) с полями задачи по ключевым словам"""
+    column_mapping = {}
+    for col_idx, header in enumerate(headers):
+        for field_name, possible_names in _COLUMN_KEYWORDS.items():
+            if any(keyword in header for keyword in possible_names):
+                column_mapping[field_name] = col_idx
+                break
+    return column_mapping
+
 
-@dataclass
+def _cell_to_str(value: Any) -> str:
+    """Строковое значение ячейки: целые числа (в том числе 5.0) без дробной части"""
+    if type(value) is str:
+        return value.strip()  # Самый частый случай - текстовая ячейка
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip()
+
+
+@dataclass(slots=True, frozen=True)
 class MonitoringTask:
     """
     Задача мониторинга из Google Sheets
     Представляет одну строку таблицы с параметрами для отслеживания
+    Неизменяемая и хешируемая: задачу можно использовать как ключ кэша
     """
-    barcode: str                    # Баркод товара
-    quantity: int                   # Количество единиц
-    allowed_warehouses: List[int]   # Список ID складов, куда можно поставлять
+    barcode: str                            # Баркод товара
+    quantity: int                           # Количество единиц
+    allowed_warehouses: Tuple[int, ...]     # ID складов, куда можно поставлять
     max_coefficient: float          # Максимальный коэффициент платной приемки
     date_from: date                 # С какой даты можно бронировать
     date_to: date                   # До какой даты можно бронировать
     is_active: bool = True          # Активна ли задача
     
-    def is_date_valid(self) -> bool:
-        """Проверяет, актуальна ли задача для мониторинга"""
-        today = date.today()
+    # Кэш словаря для сериализации (cached_property несовместим со slots)
+    _as_dict: Optional[Dict[str, Any]] = field(init=False, default=None, repr=False, compare=False)
+    # Самая ранняя дата, с которой задачу можно мониторить (заполняется в __post_init__)
+    _earliest_monitoring_date: date = field(init=False, repr=False, compare=False)
+    
+    def __post_init__(self):
+        # Парсер передает список складов, общий для всех строк листа - храним свою неизменяемую копию
+        if type(self.allowed_warehouses) is not tuple:
+            object.__setattr__(self, "allowed_warehouses", tuple(self.allowed_warehouses))
+        monitoring_start_buffer = 30  # дней до date_from когда можно начинать мониторинг
+        object.__setattr__(
+            self, "_earliest_monitoring_date",
+            self.date_from - timedelta(days=monitoring_start_buffer)
+        )
+    
+    def is_date_valid(self, today: Optional[date] = None) -> bool:
+        """
+        Проверяет, актуальна ли задача для мониторинга
+        today можно передать заранее, чтобы при проверке списка задач не вызывать date.today() для каждой
+        """
+        if today is None:
+            today = date.today()
         # Разрешаем мониторинг, если:
         # 1. Период еще не закончился (today <= date_to)
         # 2. И до начала периода осталось не более 30 дней (можно настроить)
-        monitoring_start_buffer = 30  # дней до date_from когда можно начинать мониторинг
-        earliest_monitoring_date = self.date_from - timedelta(days=monitoring_start_buffer)
-        
-        return earliest_monitoring_date <= today <= self.date_to
+        return self._earliest_monitoring_date <= today <= self.date_to
+    
+    @property
+    def as_dict(self) -> Dict[str, Any]:
+        """
+        Словарь задачи для сериализации (вложенный "task" в FoundSlot.to_dict)
+        Строится один раз и переиспользуется всеми слотами этой задачи
+        """
+        if self._as_dict is None:
+            object.__setattr__(self, "_as_dict", {
+                "barcode": self.barcode,
+                "quantity": self.quantity,
+                "allowed_warehouses": self.allowed_warehouses,
+                "max_coefficient": self.max_coefficient,
+                "date_from": self.date_from.isoformat(),
+                "date_to": self.date_to.isoformat(),
+                "is_active": self.is_active
+            })
+        return self._as_dict
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "MonitoringTask":
+        """Восстанавливает задачу из словаря as_dict (например, из дискового кэша)"""
+        return cls(
+            barcode=data["barcode"],
+            quantity=data["quantity"],
+            allowed_warehouses=tuple(data["allowed_warehouses"]),
+            max_coefficient=data["max_coefficient"],
+            date_from=date.fromisoformat(data["date_from"]),
+            date_to=date.fromisoformat(data["date_to"]),
+            is_active=data["is_active"]
+        )
 
 
 class GoogleSheetsParser:
@@ -64,14 +214,25 @@ class GoogleSheetsParser:
     Читает конфигурацию мониторинга из таблицы
     """
     
-    def __init__(self, credentials_file: str, sheet_url: str):
+    def __init__(self, credentials_file: str, sheet_url: str, wb_api: Optional[WildberriesAPI] = None):
         self.credentials_file = credentials_file
         self.sheet_url = sheet_url
+        # Клиент WB API для списка складов: монитор передает свой, чтобы использовать
+        # его HTTP-сессию и rate limiter
+        self.wb_api = wb_api
         self.client = None
         self.workbook = None
-        self._warehouse_cache = {}  # Кэш для складов
+        self._warehouse_cache: Dict[str, List[int]] = {}  # Кэш ID складов по строке названий из B4
+        self._all_warehouses: Optional[List[dict]] = None  # Список всех складов WB (запрашивается один раз)
+        self._warehouse_index = None  # Нормализованные названия складов (строится вместе со списком)
+        self._warehouses_loaded_at: Optional[float] = None  # Когда получен список складов (time.monotonic)
+        self._warehouses_fingerprint: Optional[str] = None  # Отпечаток списка складов для дискового кэша задач
+        self._warehouses_lock = asyncio.Lock()
         self._tasks_cache = {}      # Кэш для задач мониторинга
         self._last_cache_update = None  # Время последнего обновления кэша
+        self._table_worksheets = None  # Листы с заголовками табличного формата (из последнего чтения ячеек)
+        self._worksheets_cache: Dict[str, Tuple[float, list]] = {}  # Списки листов: (time.monotonic, листы)
+        self.api_retry_count = 0    # Сколько раз запросы к Google API повторялись из-за лимитов
         
         # Области доступа для Google Sheets API
         self.scope = [
@@ -83,131 +244,180 @@ class GoogleSheetsParser:
         """
         Читает задачи мониторинга из конкретных ячеек таблицы (новый формат заказчика)
         Если worksheet_name не указан, читает все листы
-        ОПТИМИЗИРОВАНО: читает диапазоны ячеек вместо отдельных запросов
+        ОПТИМИЗИРОВАНО: каждый лист читается одним batchGet вместо запросов по ячейкам
+        Синхронные вызовы gspread выполняются в отдельном потоке, чтобы не блокировать event loop
         """
         if not self.workbook:
-            self._open_workbook()
+            await asyncio.to_thread(self._open_workbook)
         
         all_tasks = []
         
         try:
-            # Если указан конкретный лист, читаем только его
-            if worksheet_name:
-                worksheets = [self.workbook.worksheet(worksheet_name)]
-            else:
-                # Читаем все листы
-                worksheets = self.workbook.worksheets()
+            worksheets = await asyncio.to_thread(self._get_worksheets, worksheet_name)
+            all_worksheets = worksheets
+            
+            # Размер сетки листа уже есть в метаданных, полученных вместе со списком листов:
+            # в листе короче 8 строк нет ни одной строки данных
+            short_worksheets = [ws for ws in worksheets if ws.row_count < _DATA_FIRST_ROW]
+            if short_worksheets:
+                logger.info(f"⏭️ Пропускаем листы без строк данных: {', '.join(ws.title for ws in short_worksheets)}")
+                worksheets = [ws for ws in worksheets if ws.row_count >= _DATA_FIRST_ROW]
             
             logger.info(f"📄 Будем читать {len(worksheets)} листов")
             
+            # ОПТИМИЗАЦИЯ: конфигурацию (B4:B6) и данные (B8:C100) всех листов
+            # читаем одним batchGet на всю таблицу, диапазон данных - не дальше конца листа.
+            # В тот же запрос добавляем первую строку каждого листа: по ней видно,
+            # есть ли в таблице листы старого табличного формата
+            ranges = [absolute_range_name(worksheet.title, '1:1') for worksheet in all_worksheets]
             for worksheet in worksheets:
-                logger.info(f"📄 Читаем лист: {worksheet.title}")
-                
-                try:
-                    # ОПТИМИЗАЦИЯ: читаем все нужные ячейки одним запросом с обработкой ошибок
-                    # Читаем конфигурацию (B4:B6) и данные (B8:C100) за два запроса вместо 200+
-                    config_range = self._safe_range_request(worksheet, 'B4:B6')
-                    data_range = self._safe_range_request(worksheet, 'B8:C100')
-                    
-                    # Извлекаем конфигурационные данные
-                    warehouse_names_str = config_range[0].value or ""  # B4
-                    date_from_str = config_range[1].value or ""        # B5  
-                    date_to_str = config_range[2].value or ""          # B6
-                    
-                    logger.info(f"🏢 Склады из B4: {warehouse_names_str}")
-                    logger.info(f"📅 Период: {date_from_str} - {date_to_str}")
-                    
-                    # Проверяем, заполнена ли ячейка со складами
-                    if not warehouse_names_str or warehouse_names_str.strip() == "":
-                        logger.warning(f"⚠️ Пропускаем лист {worksheet.title}: не указаны склады в ячейке B4")
-                        continue
-                    
-                    # Парсим общие настройки
-                    date_from = self._parse_date(date_from_str)
-                    date_to = self._parse_date(date_to_str)
-                    
-                    # Получаем ID складов по их названиям для этого листа
-                    worksheet_allowed_warehouses = await self._get_warehouse_ids_by_names(warehouse_names_str)
-                    
-                    # ОПТИМИЗАЦИЯ: обрабатываем данные из уже загруженного диапазона
-                    tasks = []
-                    empty_rows_count = 0
-                    
-                    # data_range содержит ячейки B8:C100, обрабатываем их парами
-                    for i in range(0, len(data_range), 2):
-                        if i + 1 >= len(data_range):
-                            break
-                            
-                        barcode_cell = data_range[i]      # B колонка
-                        quantity_cell = data_range[i + 1] # C колонка
-                        row_number = 8 + i // 2
-                        
-                        # Нормализуем данные
-                        barcode_clean = str(barcode_cell.value).strip() if barcode_cell.value else ""
-                        quantity_clean = str(quantity_cell.value).strip() if quantity_cell.value else ""
-                        
-                        # Проверяем состояние строки
-                        has_barcode = barcode_clean != ""
-                        has_quantity = quantity_clean != ""
-                        
-                        # Логика валидации строки
-                        if not has_barcode and not has_quantity:
-                            # Обе ячейки пустые
-                            empty_rows_count += 1
-                            logger.debug(f"🔍 Строка {row_number}: пустая ({empty_rows_count} подряд)")
-                            
-                            if empty_rows_count >= 2:
-                                logger.info(f"⏹️ Две пустые строки подряд, прекращаем чтение листа {worksheet.title}")
-                                break
-                                
-                        elif has_barcode and not has_quantity:
-                            # Есть баркод, но нет количества
-                            logger.warning(f"⚠️ Строка {row_number}: пропускаем - есть баркод '{barcode_clean}', но нет количества")
-                            empty_rows_count = 0
-                            
-                        elif not has_barcode and has_quantity:
-                            # Есть количество, но нет баркода
-                            logger.warning(f"⚠️ Строка {row_number}: пропускаем - есть количество '{quantity_clean}', но нет баркода")
-                            empty_rows_count = 0
-                            
-                        else:
-                            # Есть и баркод, и количество - валидная строка
-                            empty_rows_count = 0
-                            
-                            try:
-                                quantity = int(quantity_clean)
-                            except ValueError:
-                                logger.warning(f"⚠️ Строка {row_number}: неверное количество '{quantity_clean}', используем 1")
-                                quantity = 1
-                            
-                            # Создаем задачу мониторинга
-                            task = MonitoringTask(
-                                barcode=barcode_clean,
-                                quantity=quantity,
-                                allowed_warehouses=worksheet_allowed_warehouses,
-                                max_coefficient=1.0,  # Пока ищем только бесплатные слоты
-                                date_from=date_from,
-                                date_to=date_to,
-                                is_active=True
-                            )
-                            
-                            tasks.append(task)
-                            logger.info(f"✅ Добавлена задача: {barcode_clean} ({quantity} шт) из листа {worksheet.title}")
-                    
-                    logger.info(f"✅ Загружено {len(tasks)} задач из листа {worksheet.title}")
-                    all_tasks.extend(tasks)
-                    
-                except Exception as e:
-                    logger.error(f"❌ Ошибка чтения листа {worksheet.title}: {e}")
+                last_row = min(_DATA_LAST_ROW, worksheet.row_count)
+                ranges.append(absolute_range_name(worksheet.title, 'B4:B6'))
+                ranges.append(absolute_range_name(worksheet.title, f'B{_DATA_FIRST_ROW}:C{last_row}'))
+            values = await asyncio.to_thread(self._safe_batch_get, ranges)
+            header_values, values = values[:len(all_worksheets)], values[len(all_worksheets):]
+            
+            self._table_worksheets = []
+            for worksheet, header_rows in zip(all_worksheets, header_values):
+                headers = [str(header).strip().lower() for header in header_rows[0]] if header_rows else []
+                column_mapping = _match_columns(headers)
+                if "barcode" in column_mapping and "quantity" in column_mapping:
+                    self._table_worksheets.append(worksheet)
+            
+            # Листы разбираем параллельно: поиск складов по названиям из B4
+            # у разных листов выполняется одновременно
+            results = await asyncio.gather(
+                *(
+                    self._parse_worksheet(worksheet, values[2 * index], values[2 * index + 1])
+                    for index, worksheet in enumerate(worksheets)
+                ),
+                return_exceptions=True
+            )
+            
+            for worksheet, result in zip(worksheets, results):
+                if isinstance(result, Exception):
+                    logger.error(f"❌ Ошибка чтения листа {worksheet.title}: {result}")
                     continue
+                all_tasks.extend(result)
             
             logger.info(f"✅ Итого загружено {len(all_tasks)} задач мониторинга из {len(worksheets)} листов")
             return all_tasks
             
         except Exception as e:
             logger.error(f"❌ Ошибка чтения таблицы: {e}")
+            # Возможно, лист переименован или удален - в следующий раз запросим список заново
+            self._worksheets_cache.clear()
             raise
     
+    async def _parse_worksheet(self, worksheet, config_rows: List[List[Any]],
+                               data_rows: List[List[Any]]) -> List[MonitoringTask]:
+        """
+        Разбирает уже загруженные диапазоны одного листа в задачи мониторинга
+        config_rows - значения B4:B6 (склады и период), data_rows - строки B8:C100 (баркод и количество)
+        """
+        logger.info(f"📄 Читаем лист: {worksheet.title}")
+        
+        # Извлекаем конфигурационные данные (пустые ячейки API не возвращает)
+        config_values = [row[0] if row else "" for row in config_rows]
+        config_values += [""] * (3 - len(config_values))
+        warehouse_names_str, date_from_str, date_to_str = config_values[:3]  # B4, B5, B6
+        warehouse_names_str = str(warehouse_names_str)
+        
+        logger.info(f"🏢 Склады из B4: {warehouse_names_str}")
+        logger.info(f"📅 Период: {date_from_str} - {date_to_str}")
+        
+        # Проверяем, заполнена ли ячейка со складами
+        if not warehouse_names_str or warehouse_names_str.strip() == "":
+            logger.warning(f"⚠️ Пропускаем лист {worksheet.title}: не указаны склады в ячейке B4")
+            return []
+        
+        # Парсим общие настройки
+        today = date.today()
+        date_from = self._parse_date(date_from_str, today)
+        date_to = self._parse_date(date_to_str, today)
+        
+        # Получаем ID складов по их названиям для этого листа
+        worksheet_allowed_warehouses = await self._get_warehouse_ids_by_names(warehouse_names_str)
+        
+        # ОПТИМИЗАЦИЯ: обрабатываем данные из уже загруженного диапазона
+        tasks = []
+        empty_rows_count = 0
+        # Построчные логи не форматируем, если уровень логирования их все равно отбросит
+        log_debug = logger.isEnabledFor(logging.DEBUG)
+        
+        # data_rows содержит строки B8:C100 (хвостовые пустые строки и ячейки API обрезает)
+        for row_number, row in enumerate(data_rows, start=_DATA_FIRST_ROW):
+            # API обрезает пустые ячейки в конце строки - дополняем до двух колонок
+            if len(row) < 2:
+                row = (row + ["", ""])[:2]
+            barcode_value, quantity_value = row[0], row[1]  # B и C колонки
+            
+            # Нормализуем данные (числовые ячейки приходят числами)
+            barcode_clean = _cell_to_str(barcode_value)
+            quantity_clean = _cell_to_str(quantity_value)
+            
+            # Проверяем состояние строки
+            has_barcode = barcode_clean != ""
+            has_quantity = quantity_clean != ""
+            
+            # Логика валидации строки
+            if not has_barcode and not has_quantity:
+                # Обе ячейки пустые
+                empty_rows_count += 1
+                if log_debug:
+                    logger.debug(f"🔍 Строка {row_number}: пустая ({empty_rows_count} подряд)")
+                
+                if empty_rows_count >= 2:
+                    logger.info(f"⏹️ Две пустые строки подряд, прекращаем чтение листа {worksheet.title}")
+                    break
+            
+            elif has_barcode and not has_quantity:
+                # Есть баркод, но нет количества
+                logger.warning(f"⚠️ Строка {row_number}: пропускаем - есть баркод '{barcode_clean}', но нет количества")
+                empty_rows_count = 0
+            
+            elif not has_barcode and has_quantity:
+                # Есть количество, но нет баркода
+                logger.warning(f"⚠️ Строка {row_number}: пропускаем - есть количество '{quantity_clean}', но нет баркода")
+                empty_rows_count = 0
+            
+            else:
+                # Есть и баркод, и количество - валидная строка
+                empty_rows_count = 0
+                
+                # Обычно количество - число из ячейки (UNFORMATTED_VALUE отдает int/float)
+                # или строка из цифр, исключение ловим только для редких значений вида "5,0"
+                if type(quantity_value) is int:
+                    quantity = quantity_value
+                elif type(quantity_value) is float:
+                    quantity = int(quantity_value)
+                elif quantity_clean.isdecimal():
+                    quantity = int(quantity_clean)
+                else:
+                    try:
+                        quantity = int(float(quantity_clean.replace(',', '.')))
+                    except (ValueError, OverflowError):
+                        logger.warning(f"⚠️ Строка {row_number}: неверное количество '{quantity_clean}', используем 1")
+                        quantity = 1
+                
+                # Создаем задачу мониторинга
+                task = MonitoringTask(
+                    barcode=barcode_clean,
+                    quantity=quantity,
+                    allowed_warehouses=worksheet_allowed_warehouses,
+                    max_coefficient=1.0,  # Пока ищем только бесплатные слоты
+                    date_from=date_from,
+                    date_to=date_to,
+                    is_active=True
+                )
+                
+                tasks.append(task)
+                if log_debug:
+                    logger.debug(f"✅ Добавлена задача: {barcode_clean} ({quantity} шт) из листа {worksheet.title}")
+        
+        logger.info(f"✅ Загружено {len(tasks)} задач из листа {worksheet.title}")
+        return tasks
+    
     async def _get_warehouse_ids_by_names(self, warehouse_names_str: str) -> List[int]:
         """
         Получает ID складов по их названиям
@@ -216,48 +426,75 @@ class GoogleSheetsParser:
         if not warehouse_names_str:
             return []
         
-        # Парсим названия складов
-        warehouse_names = [name.strip() for name in warehouse_names_str.split(',')]
-        logger.info(f"🔍 Ищем ID для складов: {warehouse_names}")
+        self._expire_warehouse_caches()
+        
+        # Одинаковая строка складов на разных листах - сопоставляем только один раз
+        cache_key = warehouse_names_str.strip().lower()
+        if cache_key in self._warehouse_cache:
+            return list(self._warehouse_cache[cache_key])
         
-        # Получаем все склады через API
-        api = WildberriesAPI(config.wb_api_key)
+        # Парсим названия складов: пустое название от лишней запятой входит в любое
+        # название склада и подобрало бы случайный склад, поэтому пропускаем его
+        warehouse_names = [name for name in map(str.strip, warehouse_names_str.split(',')) if name]
+        logger.info(f"🔍 Ищем ID для складов: {warehouse_names}")
         
         try:
-            all_warehouses = await api.get_warehouses()
-            logger.info(f"📋 Получено {len(all_warehouses)} складов от API")
+            all_warehouses = await self._get_all_warehouses()
+            # Листы разбираются параллельно: пока ждали список складов, ту же строку
+            # могли уже сопоставить для другого листа
+            if cache_key in self._warehouse_cache:
+                return list(self._warehouse_cache[cache_key])
+            # Диагностические циклы по складам выполняем только при включенном INFO
+            log_info = logger.isEnabledFor(logging.INFO)
 
             # Показываем примеры складов для отладки
-            logger.info("🔍 Примеры складов из API (первые 10):")
-            for i, warehouse in enumerate(all_warehouses[:10]):
-                wh_name = warehouse.get('name', 'Без названия')
-                wh_id = warehouse.get('id', 0)
-                logger.info(f"  {i+1}. ID: {wh_id}, Название: '{wh_name}'")
+            if log_info:
+                logger.info("🔍 Примеры складов из API (первые 10):")
+                for i, warehouse in enumerate(all_warehouses[:10]):
+                    wh_name = warehouse.get('name', 'Без названия')
+                    wh_id = warehouse.get('id', 0)
+                    logger.info(f"  {i+1}. ID: {wh_id}, Название: '{wh_name}'")
             
             # Ищем соответствия
             found_warehouses = []
 
             search_results = {}  # Для детальной диагностики
 
-            for warehouse in all_warehouses:
-                warehouse_name = warehouse.get('name', '')
-                warehouse_id = warehouse.get('id', 0)
-                
+            # Индекс названий строится один раз на список складов, а не на каждую строку B4
+            warehouses_by_name, wh_index = self._warehouse_index or self._build_warehouse_index(all_warehouses)
+            
+            # Точные совпадения находим поиском в словаре по названию: при точном
+            # совпадении оно всегда лучшее, перебирать склады для такого названия не нужно
+            fuzzy_names = []  # Названия без точного совпадения - ищем по вхождению
+            for target_name in warehouse_names:
+                warehouse = warehouses_by_name.get(target_name.lower())
+                if warehouse is None:
+                    fuzzy_names.append(target_name)
+                    continue
+                search_results[target_name] = [{
+                    'id': warehouse.get('id', 0),
+                    'name': warehouse.get('name', ''),
+                    'match_type': 'exact',
+                    'rank': _MATCH_RANK['exact']
+                }]
+
+            # Нижний регистр и названия без общих слов ("склад", "warehouse") для складов
+            # уже в индексе, для искомых названий считаем один раз, а не для каждой пары
+            tgt_index = []
+            for target_name in fuzzy_names:
+                target_lower = target_name.lower().strip()
+                clean_target = target_lower.replace('склад', '').replace('warehouse', '').strip()
+                tgt_index.append((target_name, target_lower, clean_target))
+
+            for warehouse_id, warehouse_name, warehouse_lower, clean_warehouse in wh_index:
                 # Проверяем точное совпадение или вхождение
-                for target_name in warehouse_names:
-                    target_lower = target_name.lower().strip()
-                    warehouse_lower = warehouse_name.lower()
-                    
+                for target_name, target_lower, clean_target in tgt_index:
                     # Различные способы сопоставления
                     exact_match = target_lower == warehouse_lower
                     target_in_warehouse = target_lower in warehouse_lower
                     warehouse_in_target = warehouse_lower in target_lower
                     
                     # Дополнительная логика для городов
-                    # Убираем общие слова для более точного поиска
-                    clean_target = target_lower.replace('склад', '').replace('warehouse', '').strip()
-                    clean_warehouse = warehouse_lower.replace('склад', '').replace('warehouse', '').strip()
-                    
                     city_match = (clean_target in clean_warehouse or 
                                 clean_warehouse in clean_target) and len(clean_target) > 2
                     
@@ -265,55 +502,112 @@ class GoogleSheetsParser:
                         if target_name not in search_results:
                             search_results[target_name] = []
                         
+                        match_type = ('exact' if exact_match else 
+                                      'target_in_warehouse' if target_in_warehouse else
+                                      'warehouse_in_target' if warehouse_in_target else 'city_match')
                         search_results[target_name].append({
                             'id': warehouse_id,
                             'name': warehouse_name,
-                            'match_type': 'exact' if exact_match else 
-                                        'target_in_warehouse' if target_in_warehouse else
-                                        'warehouse_in_target' if warehouse_in_target else 'city_match'
+                            'match_type': match_type,
+                            'rank': _MATCH_RANK[match_type]
                         })
 
             # Анализируем результаты поиска
-            logger.info("🔍 Результаты поиска складов:")
+            if log_info:
+                logger.info("🔍 Результаты поиска складов:")
             for target_name, matches in search_results.items():
-                logger.info(f"\n  🏢 Для '{target_name}' найдено {len(matches)} совпадений:")
-                
-                # Сортируем по типу совпадения (exact сначала)
-                matches.sort(key=lambda x: ['exact', 'target_in_warehouse', 'city_match', 'warehouse_in_target'].index(x['match_type']))
+                if log_info:
+                    logger.info(f"\n  🏢 Для '{target_name}' найдено {len(matches)} совпадений:")
+                    # Сортируем по типу совпадения (exact сначала) только для вывода первых 5
+                    for i, match in enumerate(sorted(matches, key=itemgetter('rank'))[:5]):
+                        logger.info(f"    {i+1}. ID: {match['id']}, Название: '{match['name']}', Тип: {match['match_type']}")
                 
-                for i, match in enumerate(matches[:5]):  # Показываем первые 5
-                    logger.info(f"    {i+1}. ID: {match['id']}, Название: '{match['name']}', Тип: {match['match_type']}")
-                
-                # Берем лучшее совпадение (первое после сортировки)
+                # Берем лучшее совпадение: min, как и устойчивая сортировка,
+                # из равных по типу выбирает первое найденное
                 if matches:
-                    best_match = matches[0]
+                    best_match = min(matches, key=itemgetter('rank'))
                     found_warehouses.append(best_match['id'])
-                    logger.info(f"  ✅ Выбран: ID {best_match['id']} - '{best_match['name']}'")
+                    if log_info:
+                        logger.info(f"  ✅ Выбран: ID {best_match['id']} - '{best_match['name']}'")
                 else:
                     logger.warning(f"  ❌ Не найдено совпадений для '{target_name}'")
              
             
             if not found_warehouses:
                 logger.warning(f"⚠️ Не найдены склады для названий: {warehouse_names}")
-                logger.info("💡 Показываем все доступные склады для справки:")
-            for warehouse in all_warehouses:
-                wh_name = warehouse.get('name', '')
-                wh_id = warehouse.get('id', 0)
-                # Показываем склады, которые содержат хотя бы одно из ключевых слов
-                for target in warehouse_names:
-                    if target.lower()[:3] in wh_name.lower():  # Первые 3 буквы
-                        logger.info(f"  💡 Возможно подходит: ID {wh_id} - '{wh_name}'")
-                        break
-            
-            logger.info("💡 Если подходящие склады не найдены, будем искать на всех складах")
+                if log_info:
+                    logger.info("💡 Показываем все доступные склады для справки:")
+                    # Показываем склады, которые содержат первые 3 буквы хотя бы одного названия
+                    prefixes = {name.lower()[:3] for name in warehouse_names if len(name) >= 3}
+                    for wh_id, wh_name, warehouse_lower, _ in wh_index:
+                        if any(prefix in warehouse_lower for prefix in prefixes):
+                            logger.info(f"  💡 Возможно подходит: ID {wh_id} - '{wh_name}'")
+                
+                logger.info("💡 Если подходящие склады не найдены, будем искать на всех складах")
              
             logger.info(f"✅ Итого найдено складов: {len(found_warehouses)} - {found_warehouses}")
+            if all_warehouses:
+                self._warehouse_cache[cache_key] = list(found_warehouses)
             return found_warehouses
             
         except Exception as e:
             logger.error(f"❌ Ошибка получения складов: {e}")
             return []
     
+    async def _get_all_warehouses(self) -> List[dict]:
+        """
+        Возвращает список всех складов WB
+        Запрашивает его у API один раз, дальше отдает сохраненный
+        """
+        async with self._warehouses_lock:
+            if self._all_warehouses is None:
+                api = self.wb_api or WildberriesAPI(config.wb_api_key)
+                try:
+                    all_warehouses = await api.get_warehouses()
+                finally:
+                    # Временный клиент закрываем сразу, общий закрывает его владелец
+                    if api is not self.wb_api:
+                        await api.close()
+                logger.info(f"📋 Получено {len(all_warehouses)} складов от API")
+                # Пустой ответ не сохраняем - запросим снова при следующем листе
+                if not all_warehouses:
+                    return all_warehouses
+                self._all_warehouses = all_warehouses
+                self._warehouse_index = self._build_warehouse_index(all_warehouses)
+                self._warehouses_fingerprint = self._fingerprint_warehouses(all_warehouses)
+                self._warehouses_loaded_at = time.monotonic()
+            return self._all_warehouses
+    
+    def _expire_warehouse_caches(self):
+        """
+        Сбрасывает список складов WB и сопоставления названий, если они старше TTL,
+        чтобы новые склады WB подхватывались без перезапуска
+        """
+        if (self._warehouses_loaded_at is not None
+                and time.monotonic() - self._warehouses_loaded_at >= _WAREHOUSES_CACHE_TTL):
+            self._all_warehouses = None
+            self._warehouse_index = None
+            self._warehouse_cache.clear()
+            self._warehouses_loaded_at = None
+            self._warehouses_fingerprint = None
+    
+    @staticmethod
+    def _build_warehouse_index(all_warehouses: List[dict]) -> Tuple[Dict[str, dict], List[Tuple[int, str, str, str]]]:
+        """
+        Строит индекс для сопоставления названий складов:
+        словарь "название в нижнем регистре -> склад" (первый с таким названием) и список
+        (ID, название, название в нижнем регистре, название без "склад"/"warehouse")
+        """
+        warehouses_by_name = {}
+        wh_index = []
+        for warehouse in all_warehouses:
+            warehouse_name = warehouse.get('name', '')
+            warehouse_lower = warehouse_name.lower()
+            clean_warehouse = warehouse_lower.replace('склад', '').replace('warehouse', '').strip()
+            warehouses_by_name.setdefault(warehouse_lower, warehouse)
+            wh_index.append((warehouse.get('id', 0), warehouse_name, warehouse_lower, clean_warehouse))
+        return warehouses_by_name, wh_index
+    
     def _authenticate(self):
         """
         Авторизация в Google Sheets API
@@ -324,52 +618,48 @@ class GoogleSheetsParser:
                 self.credentials_file, 
                 scopes=self.scope
             )
-            self.client = gspread.authorize(creds)
+            # Одна сессия с пулом соединений на все запросы к таблице: TLS-соединение
+            # переиспользуется. Адаптер повторяет только неудачные подключения - ответы
+            # 429/5xx повторяет _retry_on_api_limit, иначе повторы двух уровней перемножались бы
+            session = AuthorizedSession(creds)
+            session.mount('https://', HTTPAdapter(
+                pool_connections=4,
+                pool_maxsize=16,
+                max_retries=Retry(total=3, connect=3, read=0, status=0, backoff_factor=0.5)
+            ))
+            self.client = gspread.authorize(creds, session=session)
             logger.info("✅ Успешная авторизация в Google Sheets")
         except Exception as e:
             logger.error(f"❌ Ошибка авторизации в Google Sheets: {e}")
             raise
     
+    @_retry_on_api_limit()
     def _open_workbook(self):
         """Открывает таблицу по URL с обработкой ошибок лимитов"""
-        max_retries = 3
-        retry_delay = 2
-        
-        for attempt in range(max_retries):
-            try:
-                if not self.client:
-                    self._authenticate()
-                
-                # Извлекаем ID таблицы из URL
-                sheet_id = self._extract_sheet_id(self.sheet_url)
-                logger.info(f"📋 Пытаемся открыть таблицу с ID: {sheet_id}")
-                self.workbook = self.client.open_by_key(sheet_id)
-                logger.info(f"📊 Открыта таблица: {self.workbook.title}")
-                return
-                
-            except APIError as e:
-                if "429" in str(e) or "Quota exceeded" in str(e):
-                    if attempt < max_retries - 1:
-                        wait_time = retry_delay * (2 ** attempt)
-                        logger.warning(f"⏳ Превышен лимит API, ждем {wait_time} секунд перед повтором (попытка {attempt + 1}/{max_retries})")
-                        time.sleep(wait_time)
-                        continue
-                    else:
-                        logger.error("❌ Превышен лимит API после всех попыток")
-                        raise
-                else:
-                    raise
-                    
-            except Exception as e:
-                logger.error(f"❌ Ошибка открытия таблицы: {e}")
-                # Добавляем детальную диагностику
-                if "404" in str(e):
-                    logger.error("💡 Возможные причины ошибки 404:")
-                    logger.error("  1. Service Account не имеет доступа к таблице")
-                    logger.error("  2. Неправильный URL или ID таблицы")
-                    logger.error("  3. Таблица удалена или перемещена")
-                    logger.error("🔧 Решение: добавьте email из credentials.json в доступ к таблице")
-                raise
+        try:
+            if not self.client:
+                self._authenticate()
+            
+            # Извлекаем ID таблицы из URL
+            sheet_id = self._extract_sheet_id(self.sheet_url)
+            logger.info(f"📋 Пытаемся открыть таблицу с ID: {sheet_id}")
+            self.workbook = self.client.open_by_key(sheet_id)
+            logger.info(f"📊 Открыта таблица: {self.workbook.title}")
+            
+        except APIError:
+            # Лимиты повторяет декоратор, остальные ошибки API пробрасываем как есть
+            raise
+            
+        except Exception as e:
+            logger.error(f"❌ Ошибка открытия таблицы: {e}")
+            # Добавляем детальную диагностику
+            if "404" in str(e):
+                logger.error("💡 Возможные причины ошибки 404:")
+                logger.error("  1. Service Account не имеет доступа к таблице")
+                logger.error("  2. Неправильный URL или ID таблицы")
+                logger.error("  3. Таблица удалена или перемещена")
+                logger.error("🔧 Решение: добавьте email из credentials.json в доступ к таблице")
+            raise
     
     def _extract_sheet_id(self, url: str) -> str:
         """
@@ -379,93 +669,89 @@ class GoogleSheetsParser:
 
         logger.info(f"🔍 Извлекаем ID из URL: {url}")
 
-        patterns = [
-            r'/spreadsheets/d/([a-zA-Z0-9-_]+)',
-            r'key=([a-zA-Z0-9-_]+)',
-            r'/d/([a-zA-Z0-9-_]+)'
-        ]
-        
-        for pattern in patterns:
-            match = re.search(pattern, url)
-            if match:
-                sheet_id = match.group(1)
-                logger.info(f"✅ Найден ID таблицы: {sheet_id}")
-                return sheet_id
-
+        match = _SHEET_ID_RE.search(url)
+        if match:
+            sheet_id = match.group(1)
+            logger.info(f"✅ Найден ID таблицы: {sheet_id}")
+            return sheet_id
         
         raise ValueError(f"Не удалось извлечь ID из URL: {url}")
     
-    def _parse_date(self, date_str: str) -> date:
+    def _parse_date(self, date_str: Any, today: Optional[date] = None) -> date:
         """
-        Парсит дату из строки
+        Парсит дату из строки или серийного номера даты Google Sheets
         Поддерживает форматы: DD.MM.YYYY, DD/MM/YYYY, YYYY-MM-DD, DD.MM (текущий год)
+        today используется для пустых/нераспознанных дат и DD.MM - при разборе многих строк
+        его передают один раз, чтобы не вызывать date.today() на каждую ячейку
         """
-        if not date_str or date_str.strip() == "":
-            return date.today()
+        # Ячейка с датой приходит числом - днями от 30.12.1899
+        if isinstance(date_str, (int, float)) and not isinstance(date_str, bool) and date_str > 0:
+            return _SHEETS_EPOCH + timedelta(days=int(date_str))
         
-        date_str = date_str.strip()
-        current_year = date.today().year
-        
-        # Пробуем разные форматы
-        formats = [
-            "%d.%m.%Y",   # 15.07.2025
-            "%d/%m/%Y",   # 15/07/2025
-            "%Y-%m-%d",   # 2025-07-15
-            "%d.%m.%y",   # 15.07.25
-            "%d/%m/%y",   # 15/07/25
-        ]
+        if today is None:
+            today = date.today()
         
-        for fmt in formats:
-            try:
-                return datetime.strptime(date_str, fmt).date()
-            except ValueError:
-                continue
+        # Остальные нестроковые значения (ноль, отрицательное число, флажок) датой не являются
+        if not isinstance(date_str, str):
+            if date_str is not None:
+                logger.warning(f"⚠️ Не удалось распарсить дату: {date_str!r}, используем сегодня")
+            return today
         
-        # Пробуем формат без года (DD.MM или DD/MM)
-        short_formats = [
-            "%d.%m",      # 12.07
-            "%d/%m",      # 12/07
-        ]
+        date_str = date_str.strip()
+        if not date_str:
+            return today
+        
+        # Все форматы разбираем регулярными выражениями и собираем дату из чисел,
+        # без перебора strptime с исключением на каждый неподходящий формат
+        match = _DATE_RE.match(date_str)
+        if match:
+            # DD.MM.YYYY, DD/MM/YY, DD.MM
+            day_str, _, month_str, year_str = match.groups()
+            if year_str is None:
+                year = today.year  # Подставляем текущий год
+            elif len(year_str) == 2:
+                # Как %y в strptime: 69-99 -> 1969-1999, 00-68 -> 2000-2068
+                year = int(year_str)
+                year += 1900 if year >= 69 else 2000
+            else:
+                year = int(year_str)
+        else:
+            # YYYY-MM-DD
+            match = _ISO_DATE_RE.match(date_str)
+            if match:
+                year_str, month_str, day_str = match.groups()
+                year = int(year_str)
         
-        for fmt in short_formats:
+        if match:
             try:
-                parsed_date = datetime.strptime(date_str, fmt).date()
-                # Подставляем текущий год
-                return parsed_date.replace(year=current_year)
+                return date(year, int(month_str), int(day_str))
             except ValueError:
-                continue
+                pass
         
         logger.warning(f"⚠️ Не удалось распарсить дату: {date_str}, используем сегодня")
-        return date.today()
+        return today
     
     def _parse_warehouses(self, warehouses_str: str) -> List[int]:
         """
         Парсит список складов из строки
         Поддерживает форматы: "123,456,789" или "123; 456; 789" или "все"
         """
-        if not warehouses_str or warehouses_str.strip() == "":
+        warehouses_str = warehouses_str.strip().lower() if warehouses_str else ""
+        if not warehouses_str:
             return []
         
-        warehouses_str = warehouses_str.strip().lower()
-        
         # Если указано "все" или аналогичное - возвращаем пустой список (значит все склады)
-        if warehouses_str in ["все", "all", "любые", "*"]:
+        if warehouses_str in _ALL_MARKERS:
             return []
         
-        # Парсим числа через запятую или точку с запятой
-        separators = [",", ";", "|"]
-        for sep in separators:
-            if sep in warehouses_str:
-                parts = warehouses_str.split(sep)
-                break
-        else:
-            # Если разделителей нет, считаем что это один склад
-            parts = [warehouses_str]
+        # Парсим числа через запятую, точку с запятой или "|" за один проход
+        # (если разделителей нет, получится один склад); пустые части от "1,,2" или "1,2," пропускаем
+        parts = [part for part in map(str.strip, _WAREHOUSE_SPLIT_RE.split(warehouses_str)) if part]
         
         warehouse_ids = []
         for part in parts:
             try:
-                warehouse_id = int(part.strip())
+                warehouse_id = int(part)
                 warehouse_ids.append(warehouse_id)
             except ValueError:
                 logger.warning(f"⚠️ Не удалось распарсить ID склада: {part}")
@@ -478,41 +764,78 @@ class GoogleSheetsParser:
         Автоматически определяет формат таблицы и использует подходящий парсер
         С кэшированием для уменьшения количества запросов к API
         """
+        cache_key = f"{worksheet_name or 'all'}"
+        
         # Проверяем кэш
         if use_cache and self._should_use_cache():
-            cache_key = f"{worksheet_name or 'all'}"
             if cache_key in self._tasks_cache:
                 logger.info(f"🚀 Используем кэшированные данные для {cache_key}")
                 return self._tasks_cache[cache_key]
         
+        # Таблица не менялась с прошлого чтения (в том числе до перезапуска) -
+        # берем задачи с диска: один легкий запрос к Drive API вместо чтения всех листов
+        modified_time = None
+        warehouses_fingerprint = None
+        if use_cache:
+            try:
+                if not self.workbook:
+                    await asyncio.to_thread(self._open_workbook)
+                modified_time = await asyncio.to_thread(self._get_modified_time)
+            except Exception as e:
+                logger.warning(f"⚠️ Не удалось получить время изменения таблицы: {e}")
+            
+            if modified_time:
+                # ID складов в задачах зависят и от списка складов WB (TTL _WAREHOUSES_CACHE_TTL),
+                # поэтому кэш действителен, только пока этот список не изменился
+                warehouses_fingerprint = await self._get_warehouses_fingerprint()
+                tasks = await asyncio.to_thread(
+                    self._load_disk_cache, cache_key, modified_time, warehouses_fingerprint
+                )
+                if tasks is not None:
+                    logger.info(f"💾 Таблица не менялась, задачи для {cache_key} взяты из дискового кэша")
+                    self._update_cache(worksheet_name, tasks)
+                    return tasks
+        
+        # Без кэша читаем и список листов заново
+        if not use_cache:
+            self._worksheets_cache.clear()
+        
+        # Пробуем новый формат с ячейками (формат заказчика)
+        # Ошибки чтения таблицы пробрасываем: табличный формат читает те же листы
+        # через тот же API и только удвоил бы число запросов
+        logger.info("🔄 Пытаемся прочитать таблицу в формате ячеек...")
+        self._table_worksheets = None
         try:
-            # Пробуем новый формат с ячейками (формат заказчика)
-            logger.info("🔄 Пытаемся прочитать таблицу в формате ячеек...")
             tasks = await self.get_monitoring_tasks_from_cells(worksheet_name)
-            
-            # Сохраняем в кэш
-            if use_cache:
-                self._update_cache(worksheet_name, tasks)
-            
-            return tasks
-            
         except Exception as e:
             logger.warning(f"⚠️ Не удалось прочитать формат ячеек: {e}")
-            
-            # Fallback на старый табличный формат
-            logger.info("🔄 Пробуем старый табличный формат...")
-            tasks = self._get_monitoring_tasks_table_format(worksheet_name)
-            
-            # Сохраняем в кэш
-            if use_cache:
-                self._update_cache(worksheet_name, tasks)
-            
-            return tasks
+            raise
+        
+        if not tasks and self._table_worksheets:
+            # Задач в формате ячеек нет, а у части листов в первой строке заголовки
+            # старого табличного формата - читаем целиком только эти листы.
+            # Таблица в формате ячеек без активных задач сюда не попадает
+            logger.info("🔄 Задач в формате ячеек нет, пробуем старый табличный формат...")
+            tasks = await asyncio.to_thread(
+                self._get_monitoring_tasks_table_format, worksheet_name, self._table_worksheets
+            )
+        
+        # Сохраняем в кэш
+        if use_cache:
+            self._update_cache(worksheet_name, tasks)
+            if modified_time and warehouses_fingerprint:
+                await asyncio.to_thread(
+                    self._save_disk_cache, cache_key, modified_time, warehouses_fingerprint, tasks
+                )
+        
+        return tasks
     
-    def _get_monitoring_tasks_table_format(self, worksheet_name: str = None) -> List[MonitoringTask]:
+    def _get_monitoring_tasks_table_format(self, worksheet_name: str = None,
+                                           worksheets: Optional[List[Any]] = None) -> List[MonitoringTask]:
         """
         Читает задачи в старом табличном формате (для совместимости)
         Если worksheet_name не указан, читает все листы
+        worksheets - уже полученный список листов, чтобы не запрашивать его повторно
         """
         if not self.workbook:
             self._open_workbook()
@@ -520,21 +843,23 @@ class GoogleSheetsParser:
         all_tasks = []
         
         try:
-            # Если указан конкретный лист, читаем только его
-            if worksheet_name:
-                worksheets = [self.workbook.worksheet(worksheet_name)]
-            else:
-                # Читаем все листы
-                worksheets = self.workbook.worksheets()
+            if worksheets is None:
+                worksheets = self._get_worksheets(worksheet_name)
             
             logger.info(f"📄 Будем читать {len(worksheets)} листов в табличном формате")
             
-            for worksheet in worksheets:
+            # Все листы целиком читаем одним batchGet (значения в отображаемом виде, как get_all_values)
+            values = self._safe_batch_get(
+                [absolute_range_name(worksheet.title) for worksheet in worksheets],
+                params=None
+            )
+            
+            for worksheet, sheet_values in zip(worksheets, values):
                 logger.info(f"📄 Читаем лист: {worksheet.title}")
                 
                 try:
-                    # Получаем все данные
-                    all_values = worksheet.get_all_values()
+                    # Получаем все данные (дополняем строки до одинаковой длины)
+                    all_values = fill_gaps(sheet_values)
                     
                     if len(all_values) < 2:
                         logger.warning(f"⚠️ В листе {worksheet.title} нет данных (только заголовки или пустой)")
@@ -547,9 +872,10 @@ class GoogleSheetsParser:
                     column_mapping = self._detect_columns(headers)
                     
                     tasks = []
+                    today = date.today()  # Одна дата на весь лист
                     for row_idx, row in enumerate(all_values[1:], start=2):
                         try:
-                            task = self._parse_row(row, column_mapping, row_idx)
+                            task = self._parse_row(row, column_mapping, row_idx, today)
                             if task:
                                 tasks.append(task)
                         except Exception as e:
@@ -568,6 +894,8 @@ class GoogleSheetsParser:
             
         except Exception as e:
             logger.error(f"❌ Ошибка чтения таблицы: {e}")
+            # Возможно, лист переименован или удален - в следующий раз запросим список заново
+            self._worksheets_cache.clear()
             raise
     
     def _detect_columns(self, headers: List[str]) -> Dict[str, int]:
@@ -575,30 +903,12 @@ class GoogleSheetsParser:
         Автоматически определяет, какая колонка за что отвечает
         Ищет по ключевым словам в заголовках
         """
-        column_mapping = {}
-        
-        # Словарь соответствий: ключ -> список возможных названий
-        keywords = {
-            "barcode": ["баркод", "штрихкод", "barcode", "штрих-код", "код товара"],
-            "quantity": ["количество", "кол-во", "quantity", "шт", "штук"],
-            "warehouses": ["склады", "склад", "warehouses", "warehouse", "wh"],
-            "max_coefficient": ["коэффициент", "коэф", "coefficient", "макс коэф", "max_coef"],
-            "date_from": ["дата с", "с даты", "from", "начало", "date_from"],
-            "date_to": ["дата до", "до даты", "to", "конец", "date_to"],
-            "active": ["активно", "active", "включено", "enabled"]
-        }
-        
-        for col_idx, header in enumerate(headers):
-            for field, possible_names in keywords.items():
-                if any(keyword in header for keyword in possible_names):
-                    column_mapping[field] = col_idx
-                    break
-        
+        column_mapping = _match_columns(headers)
         logger.info(f"🔍 Определены колонки: {column_mapping}")
         return column_mapping
     
     def _parse_row(self, row: List[str], column_mapping: Dict[str, int], 
-                   row_number: int) -> Optional[MonitoringTask]:
+                   row_number: int, today: Optional[date] = None) -> Optional[MonitoringTask]:
         """
         Парсит одну строку таблицы в объект MonitoringTask
         """
@@ -638,14 +948,16 @@ class GoogleSheetsParser:
                     logger.warning(f"⚠️ Строка {row_number}: неверный коэффициент")
             
             # Даты
-            date_from = date.today()
-            date_to = date.today()
+            if today is None:
+                today = date.today()
+            date_from = today
+            date_to = today
             
             if "date_from" in column_mapping:
-                date_from = self._parse_date(row[column_mapping["date_from"]])
+                date_from = self._parse_date(row[column_mapping["date_from"]], today)
             
             if "date_to" in column_mapping:
-                date_to = self._parse_date(row[column_mapping["date_to"]])
+                date_to = self._parse_date(row[column_mapping["date_to"]], today)
             
             # Активность
             is_active = True
@@ -687,41 +999,162 @@ class GoogleSheetsParser:
         self._last_cache_update = datetime.now()
         logger.info(f"💾 Кэш обновлен для {cache_key}: {len(tasks)} задач")
     
+    def _get_worksheets(self, worksheet_name: str = None) -> list:
+        """
+        Возвращает листы таблицы: только указанный или все
+        Список листов переиспользуется в течение _WORKSHEETS_CACHE_TTL, чтобы при каждом
+        изменении таблицы не запрашивать метаданные заново - хватает одного batchGet
+        """
+        cache_key = worksheet_name or 'all'
+        cached = self._worksheets_cache.get(cache_key)
+        now = time.monotonic()
+        if cached is not None and now - cached[0] < _WORKSHEETS_CACHE_TTL:
+            return cached[1]
+        
+        worksheets = self._fetch_worksheets(worksheet_name)
+        self._worksheets_cache[cache_key] = (now, worksheets)
+        return worksheets
+    
+    @_retry_on_api_limit()
+    def _fetch_worksheets(self, worksheet_name: str = None) -> list:
+        """
+        Запрашивает листы таблицы у API: только указанный или все
+        """
+        # Если указан конкретный лист, читаем только его
+        if worksheet_name:
+            return [self.workbook.worksheet(worksheet_name)]
+        # Читаем все листы
+        return self.workbook.worksheets()
+    
+    @_retry_on_api_limit()
+    def _get_modified_time(self) -> str:
+        """
+        Время последнего изменения таблицы (modifiedTime из Drive API)
+        Таблица должна быть уже открыта: _open_workbook повторяет запросы сам,
+        и вложенные повторы перемножили бы паузы
+        """
+        return self.workbook.get_lastUpdateTime()
+    
+    async def _get_warehouses_fingerprint(self) -> Optional[str]:
+        """
+        Отпечаток текущего списка складов WB (ID и названия) для дискового кэша задач
+        Берется из списка, сохраненного на _WAREHOUSES_CACHE_TTL: запрос к WB API
+        уходит, только если список устарел, и тот же список потом используется при разборе листов
+        Возвращает None, если список складов получить не удалось
+        """
+        self._expire_warehouse_caches()
+        try:
+            await self._get_all_warehouses()
+        except Exception as e:
+            logger.warning(f"⚠️ Не удалось получить список складов для проверки кэша: {e}")
+            return None
+        return self._warehouses_fingerprint
+    
+    @staticmethod
+    def _fingerprint_warehouses(all_warehouses: List[dict]) -> str:
+        """Отпечаток списка складов WB: меняется при добавлении, удалении или переименовании склада"""
+        pairs = sorted((str(wh.get('id', 0)), wh.get('name', '')) for wh in all_warehouses)
+        return hashlib.sha1(repr(pairs).encode("utf-8")).hexdigest()
+    
+    def _disk_cache_path(self) -> str:
+        """Путь к файлу дискового кэша задач этой таблицы"""
+        return os.path.join(_TASKS_DISK_CACHE_DIR, f"tasks_cache_{self.workbook.id}.json")
+    
+    def _load_disk_cache(self, cache_key: str, modified_time: str,
+                         warehouses_fingerprint: Optional[str]) -> Optional[List[MonitoringTask]]:
+        """
+        Возвращает задачи из дискового кэша, если таблица с тех пор не менялась,
+        задачи разобраны сегодня (пустые даты в таблице означают "сегодня")
+        и список складов WB тот же, по которому сопоставлялись названия из B4
+        Если список складов сейчас недоступен, проверку складов пропускаем:
+        прошлые ID лучше, чем задачи без складов
+        """
+        try:
+            cache = load_json_file(self._disk_cache_path())
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"⚠️ Не удалось прочитать дисковый кэш задач: {e}")
+            return None
+        
+        entry = cache.get(cache_key)
+        if (not entry or entry.get("modified_time") != modified_time
+                or entry.get("parsed_on") != date.today().isoformat()):
+            return None
+        if warehouses_fingerprint is not None and entry.get("warehouses") != warehouses_fingerprint:
+            logger.info("🔄 Список складов WB изменился, дисковый кэш задач не используем")
+            return None
+        
+        try:
+            return [MonitoringTask.from_dict(task) for task in entry["tasks"]]
+        except (KeyError, TypeError, ValueError) as e:
+            logger.warning(f"⚠️ Дисковый кэш задач поврежден: {e}")
+            return None
+    
+    def _save_disk_cache(self, cache_key: str, modified_time: str, warehouses_fingerprint: str,
+                         tasks: List[MonitoringTask]):
+        """Сохраняет задачи на диск вместе с временем изменения таблицы и отпечатком списка складов"""
+        path = self._disk_cache_path()
+        try:
+            try:
+                cache = load_json_file(path)
+            except Exception:
+                cache = {}
+            cache[cache_key] = {
+                "modified_time": modified_time,
+                "parsed_on": date.today().isoformat(),
+                "warehouses": warehouses_fingerprint,
+                "tasks": [task.as_dict for task in tasks]
+            }
+            os.makedirs(_TASKS_DISK_CACHE_DIR, exist_ok=True)
+            # Пишем во временный файл и атомарно подменяем, чтобы не оставить оборванный JSON
+            tmp_path = f"{path}.tmp"
+            dump_json_file(tmp_path, cache)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            logger.warning(f"⚠️ Не удалось сохранить дисковый кэш задач: {e}")
+    
     def clear_cache(self):
         """
-        Очищает кэш принудительно
+        Очищает кэш принудительно (в том числе дисковый кэш задач)
         """
         self._tasks_cache.clear()
         self._last_cache_update = None
+        self._warehouse_cache.clear()
+        self._all_warehouses = None
+        self._warehouse_index = None
+        self._warehouses_loaded_at = None
+        self._warehouses_fingerprint = None
+        self._worksheets_cache.clear()
+        if self.workbook:
+            try:
+                os.remove(self._disk_cache_path())
+            except FileNotFoundError:
+                pass
         logger.info("🗑️ Кэш очищен")
     
-    def _safe_range_request(self, worksheet, range_name: str, max_retries: int = 3):
+    @_retry_on_api_limit()
+    def _safe_batch_get(self, ranges: List[str],
+                        params: Optional[Dict[str, Any]] = _VALUE_RENDER_PARAMS) -> List[List[List[Any]]]:
         """
-        Безопасный запрос диапазона ячеек с обработкой ошибок лимитов API
+        Безопасное чтение нескольких диапазонов таблицы одним запросом (values.batchGet)
+        с обработкой ошибок лимитов API
+        Диапазоны указываются с именем листа ('Лист1'!B4:B6), могут быть на разных листах
+        params - параметры отображения значений (по умолчанию неформатированные значения)
+        Возвращает для каждого диапазона список строк со значениями ячеек
         """
-        retry_delay = 2
-        
-        for attempt in range(max_retries):
-            try:
-                return worksheet.range(range_name)
+        try:
+            response = self.workbook.values_batch_get(ranges, params=params)
+            return [value_range.get('values', []) for value_range in response.get('valueRanges', [])]
+            
+        except APIError as e:
+            if not _is_retryable_api_error(e):
+                logger.error(f"❌ Ошибка API при чтении {ranges}: {e}")
+            raise
                 
-            except APIError as e:
-                if "429" in str(e) or "Quota exceeded" in str(e):
-                    if attempt < max_retries - 1:
-                        wait_time = retry_delay * (2 ** attempt)
-                        logger.warning(f"⏳ Превышен лимит API при чтении {range_name}, ждем {wait_time} секунд (попытка {attempt + 1}/{max_retries})")
-                        time.sleep(wait_time)
-                        continue
-                    else:
-                        logger.error(f"❌ Превышен лимит API после всех попыток для {range_name}")
-                        raise
-                else:
-                    logger.error(f"❌ Ошибка API при чтении {range_name}: {e}")
-                    raise
-                    
-            except Exception as e:
-                logger.error(f"❌ Неизвестная ошибка при чтении {range_name}: {e}")
-                raise
+        except Exception as e:
+            logger.error(f"❌ Неизвестная ошибка при чтении {ranges}: {e}")
+            raise
 
 
 # Пример использования
@@ -733,7 +1166,7 @@ async def test_sheets_parser():
     parser = GoogleSheetsParser("credentials.json", "url_таблицы")
     
     # Когда получим реальную таблицу, раскомментируем:
-    # tasks = parser.get_monitoring_tasks()
+    # tasks = await parser.get_monitoring_tasks()
     # for task in tasks:
     #     print(f"📦 {task.barcode}: {task.quantity} шт, макс коэф {task.max_coefficient}")
 
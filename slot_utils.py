@@ -3,13 +3,114 @@
 """
 
 from typing import List, Dict, Any
+import asyncio
 import json
 import logging
 import os
+import time
+
+try:
+    import orjson
+except ImportError:
+    orjson = None  # orjson не установлен - используем стандартный json
 
 logger = logging.getLogger(__name__)
 
 
+def load_json_file(path: str) -> Any:
+    """Читает JSON из файла (через orjson, если он доступен)"""
+    if orjson is not None:
+        with open(path, "rb") as f:
+            return orjson.loads(f.read())
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def dump_json_file(path: str, data: Any):
+    """Записывает данные в JSON файл с отступами, без экранирования кириллицы"""
+    if orjson is not None:
+        with open(path, "wb") as f:
+            f.write(orjson.dumps(data, option=orjson.OPT_INDENT_2))
+        return
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+
+
+def dumps_json(data: Any) -> str:
+    """Сериализует объект в компактную JSON строку (например, для TEXT колонки SQLite)"""
+    if orjson is not None:
+        return orjson.dumps(data).decode("utf-8")
+    return json.dumps(data, ensure_ascii=False)
+
+
+def loads_json(data: Any) -> Any:
+    """Разбирает JSON из строки или bytes (через orjson, если он доступен)"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def found_slots_filename(day) -> str:
+    """Имя файла найденных слотов за день (JSON Lines, один слот на строку)"""
+    return f"found_slots/slots_{day.strftime('%Y-%m-%d')}.jsonl"
+
+
+def _json_line(data: Any) -> bytes:
+    """Сериализует объект в одну строку JSON Lines"""
+    if orjson is not None:
+        return orjson.dumps(data) + b"\n"
+    return (json.dumps(data, ensure_ascii=False) + "\n").encode("utf-8")
+
+
+def append_json_line(path: str, data: Any):
+    """Дописывает объект в конец JSON Lines файла, не перечитывая его"""
+    with open(path, "ab") as f:
+        f.write(_json_line(data))
+
+
+def load_json_lines(path: str) -> List[Any]:
+    """Читает JSON Lines файл, пропуская пустые и оборванные строки"""
+    loads = orjson.loads if orjson is not None else json.loads
+    items = []
+    with open(path, "rb") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                items.append(loads(line))
+            except ValueError:
+                logger.warning(f"⚠️ Пропущена поврежденная строка в {path}")
+    return items
+
+
+def migrate_found_slots_files(directory: str = "found_slots"):
+    """
+    Однократно переводит старые файлы slots_*.json в формат JSON Lines
+    Файл конвертируется, только если для этой даты еще нет .jsonl
+    """
+    if not os.path.isdir(directory):
+        return
+    
+    for entry in os.scandir(directory):
+        if not (entry.name.startswith("slots_") and entry.name.endswith(".json")):
+            continue
+        
+        jsonl_path = entry.path + "l"
+        if os.path.exists(jsonl_path):
+            continue
+        
+        try:
+            slots = load_json_file(entry.path)
+            tmp_path = jsonl_path + ".tmp"
+            with open(tmp_path, "wb") as f:
+                f.writelines(_json_line(slot) for slot in slots)
+            os.replace(tmp_path, jsonl_path)
+            os.remove(entry.path)
+            logger.info(f"🔄 {entry.name} переведен в формат JSON Lines")
+        except Exception as e:
+            logger.warning(f"⚠️ Ошибка конвертации {entry.path}: {e}")
+
+
 def get_current_active_slots() -> List[Dict[str, Any]]:
     """
     Возвращает текущие активные слоты для новых пользователей
@@ -19,13 +120,41 @@ def get_current_active_slots() -> List[Dict[str, Any]]:
     
     try:
         if os.path.exists(active_slots_file):
-            with open(active_slots_file, "r", encoding="utf-8") as f:
-                slots_data = json.load(f)
-                logger.info(f"📥 Загружено {len(slots_data)} активных слотов")
-                return slots_data
+            slots_data = load_json_file(active_slots_file)
+            logger.info(f"📥 Загружено {len(slots_data)} активных слотов")
+            return slots_data
         else:
             logger.info("📂 Файл активных слотов не найден, возвращаем пустой список")
             return []
     except Exception as e:
         logger.warning(f"⚠️ Ошибка загрузки активных слотов: {e}")
-        return []
\ No newline at end of file
+        return []
+
+
+class TokenBucketLimiter:
+    """
+    Token bucket: пропускает не больше rate операций в секунду,
+    допускает всплеск до burst операций после простоя
+    """
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.capacity = burst
+        self._tokens = float(burst)
+        self._last_refill = time.monotonic()
+        self._lock = asyncio.Lock()
+    
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._last_refill) * self.rate)
+        self._last_refill = now
+    
+    async def wait(self):
+        """Ждет, пока появится свободный токен, и забирает его"""
+        async with self._lock:
+            self._refill()
+            while self._tokens < 1:
+                sleep_time = (1 - self._tokens) / self.rate
+                logger.debug(f"⏳ Ожидание токена: {sleep_time:.1f}с")
+                await asyncio.sleep(sleep_time)
+                self._refill()
+            self._tokens -= 1
@@ -8,19 +8,21 @@ import logging
 from typing import List, Dict, Any, Optional, Set
 from datetime import datetime, timedelta, date
 from dataclasses import dataclass
-import json
 import sqlite3
 from pathlib import Path
 import os
 
 from aiogram import Bot, Dispatcher, types
 from aiogram.filters import Command
-from aiogram.types import Message, ReplyKeyboardMarkup, KeyboardButton, InlineKeyboardMarkup, InlineKeyboardButton
+from aiogram.types import ErrorEvent, Message, ReplyKeyboardMarkup, KeyboardButton, InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 from aiogram.utils.formatting import Text, Bold, Italic, Code
 
 from config import config
-from slot_utils import get_current_active_slots
+from slot_utils import (
+    get_current_active_slots, found_slots_filename, load_json_lines, dumps_json, loads_json,
+    TokenBucketLimiter
+)
 
 logger = logging.getLogger(__name__)
 
@@ -203,7 +205,7 @@ class TelegramDatabase:
             user.subscribed,
             user.created_at,
             user.last_seen,
-            json.dumps(user.notification_settings)
+            dumps_json(user.notification_settings)
         ))
         
         conn.commit()
@@ -228,7 +230,7 @@ class TelegramDatabase:
                 subscribed=bool(row[4]),
                 created_at=datetime.fromisoformat(row[5]) if row[5] else datetime.now(),
                 last_seen=datetime.fromisoformat(row[6]) if row[6] else datetime.now(),
-                notification_settings=json.loads(row[7]) if row[7] else {}
+                notification_settings=loads_json(row[7]) if row[7] else {}
             )
         return None
     
@@ -252,7 +254,7 @@ class TelegramDatabase:
                 subscribed=bool(row[4]),
                 created_at=datetime.fromisoformat(row[5]) if row[5] else datetime.now(),
                 last_seen=datetime.fromisoformat(row[6]) if row[6] else datetime.now(),
-                notification_settings=json.loads(row[7]) if row[7] else {}
+                notification_settings=loads_json(row[7]) if row[7] else {}
             ))
         
         return users
@@ -350,13 +352,11 @@ class TelegramDatabase:
         
         for days in range(days_back):
             check_date = today - timedelta(days=days)
-            filename = f"found_slots/slots_{check_date.strftime('%Y-%m-%d')}.json"
+            filename = found_slots_filename(check_date)
             
             if os.path.exists(filename):
                 try:
-                    with open(filename, "r", encoding="utf-8") as f:
-                        day_slots = json.load(f)
-                        slots.extend(day_slots)
+                    slots.extend(load_json_lines(filename))
                 except Exception as e:
                     logger.error(f"Ошибка чтения файла {filename}: {e}")
         
@@ -366,11 +366,20 @@ class TelegramDatabase:
 class WBSlotsBot:
     """Основной класс Telegram бота"""
     
-    def __init__(self, bot_token: str):
+    def __init__(self, bot_token: str, long_poll_timeout: int = 20):
         self.bot = Bot(token=bot_token)
         self.dp = Dispatcher()
         self.database = TelegramDatabase()
         
+        # Таймаут long polling для getUpdates (Telegram держит запрос до 50 секунд)
+        self.long_poll_timeout = long_poll_timeout
+        
+        # Ограничение числа одновременно обрабатываемых обновлений
+        self._updates_semaphore = asyncio.Semaphore(64)
+        
+        # Telegram пропускает около 30 сообщений в секунду от одного бота
+        self._send_limiter = TokenBucketLimiter(30, burst=30)
+        
         # Настройка обработчиков
         self._setup_handlers()
         
@@ -380,6 +389,18 @@ class WBSlotsBot:
     def _setup_handlers(self):
         """Настраивает обработчики команд и сообщений"""
         
+        # Каждое обновление обрабатывается в своей задаче (handle_as_tasks),
+        # семафор не дает медленным обработчикам копиться без ограничений
+        @self.dp.update.outer_middleware()
+        async def limit_concurrency(handler, event, data):
+            async with self._updates_semaphore:
+                return await handler(event, data)
+        
+        @self.dp.errors()
+        async def on_error(event: ErrorEvent):
+            logger.error(f"❌ Ошибка обработки обновления: {event.exception}")
+            return True
+        
         @self.dp.message(Command("start"))
         async def cmd_start(message: Message):
             await self._handle_start(message)
@@ -686,6 +707,7 @@ class WBSlotsBot:
                 if self.database.has_user_seen_slot(user.user_id, slot_data):
                     continue
                 
+                await self._send_limiter.wait()
                 await self.bot.send_message(
                     chat_id=user.user_id,
                     text=message_text,
@@ -816,22 +838,45 @@ class WBSlotsBot:
         logger.info(f"Broadcast отправлен {sent_count} пользователям, ошибок: {failed_count}")
         return sent_count, failed_count
     
-    async def start_polling(self):
-        """Запускает бота в режиме polling"""
+    async def start_polling(self, polling_timeout: Optional[int] = None, handle_signals: bool = True):
+        """
+        Запускает бота в режиме polling
+        
+        Args:
+            polling_timeout: Таймаут long polling для getUpdates в секундах
+                (если None - берется long_poll_timeout бота)
+            handle_signals: Если False, SIGINT/SIGTERM обрабатывает вызывающий код
+        """
         logger.info("🤖 Запуск Telegram бота...")
         
+        if polling_timeout is None:
+            polling_timeout = self.long_poll_timeout
+        
         try:
             # Проверяем подключение к API
             bot_info = await self.bot.get_me()
             logger.info(f"✅ Бот запущен: @{bot_info.username}")
             
-            # Запускаем polling
-            await self.dp.start_polling(self.bot)
+            # Запускаем long polling только по тем типам обновлений, которые обрабатываем
+            await self.dp.start_polling(
+                self.bot,
+                polling_timeout=polling_timeout,
+                handle_as_tasks=True,
+                handle_signals=handle_signals,
+                allowed_updates=self.dp.resolve_used_update_types()
+            )
             
         except Exception as e:
             logger.error(f"❌ Ошибка запуска бота: {e}")
             raise
     
+    async def stop_polling(self):
+        """Останавливает polling, если он запущен"""
+        try:
+            await self.dp.stop_polling()
+        except RuntimeError:
+            pass  # Polling не был запущен
+    
     async def stop(self):
         """Останавливает бота"""
         logger.info("🛑 Остановка Telegram бота...")
@@ -842,15 +887,20 @@ class WBSlotsBot:
 telegram_bot = None
 
 
-async def initialize_bot():
-    """Инициализирует глобальный экземпляр бота"""
+async def initialize_bot(long_poll_timeout: int = 20):
+    """
+    Инициализирует глобальный экземпляр бота
+    
+    Args:
+        long_poll_timeout: Таймаут long polling для getUpdates в секундах (до 50)
+    """
     global telegram_bot
     
     if not config.telegram_bot_token:
         logger.error("❌ Telegram bot token не настроен")
         return None
     
-    telegram_bot = WBSlotsBot(config.telegram_bot_token)
+    telegram_bot = WBSlotsBot(config.telegram_bot_token, long_poll_timeout=long_poll_timeout)
     logger.info("✅ Telegram бот инициализирован")
     
     return telegram_bot
@@ -21,11 +21,11 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-async def test_dynamic_pause_calculation():
+async def test_cycle_limiter():
     """
-    Тестирует работу динамической паузы для равномерного распределения циклов
+    Тестирует работу limiter циклов для равномерного распределения циклов
     """
-    logger.info("🧪 Тест динамической паузы")
+    logger.info("🧪 Тест limiter циклов мониторинга")
     
     monitor = SlotMonitor()
     
@@ -34,24 +34,22 @@ async def test_dynamic_pause_calculation():
     total_start = time.time()
     
     for i in range(8):
+        wait_start = time.time()
+        await monitor.cycle_limiter.wait()
+        pause = time.time() - wait_start
+        
         cycle_start = time.time()
         
         # Симулируем быстрый цикл (2 секунды)
         await asyncio.sleep(2)
         cycle_duration = time.time() - cycle_start
-        
-        # Вычисляем паузу
-        pause = monitor._calculate_dynamic_pause(cycle_duration)
         current_time = time.time() - total_start
         
-        logger.info(f"  Цикл {i+1}: {cycle_duration:.1f}с, пауза {pause:.1f}с (время {current_time:.1f}с)")
-        
-        if pause > 0:
-            await asyncio.sleep(pause)
+        logger.info(f"  Цикл {i+1}: {cycle_duration:.1f}с, пауза перед циклом {pause:.1f}с (время {current_time:.1f}с)")
     
     total_duration = time.time() - total_start
     logger.info(f"📊 Общее время: {total_duration:.1f}с")
-    logger.info("✅ Тест динамической паузы завершен")
+    logger.info("✅ Тест limiter циклов завершен")
 
 
 def test_adaptive_monitoring_interval():
@@ -166,8 +164,8 @@ async def main():
     logger.info("🚀 Запуск тестов адаптивной системы мониторинга")
     logger.info("=" * 50)
     
-    # Тест 1: Динамическая пауза
-    await test_dynamic_pause_calculation()
+    # Тест 1: Limiter циклов
+    await test_cycle_limiter()
     logger.info("")
     
     # Тест 2: Адаптивный интервал мониторинга
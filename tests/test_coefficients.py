@@ -23,7 +23,6 @@ try:
 except ImportError:
     print("⚠️ python-dotenv не установлен")
 
-config.wb_api_key = os.getenv("WB_API_KEY", config.wb_api_key)
 
 
 async def test_all_warehouses_coefficients():
@@ -6,7 +6,6 @@
 import asyncio
 import os
 import sys
-import json
 from pathlib import Path
 from datetime import datetime
 
@@ -14,6 +13,7 @@ sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from monitor import SlotMonitor
 from config import config
+from slot_utils import found_slots_filename, load_json_lines
 
 try:
     from dotenv import load_dotenv
@@ -22,9 +22,6 @@ try:
 except ImportError:
     pass
 
-# Настраиваем конфигурацию из переменных окружения
-config.wb_api_key = os.getenv("WB_API_KEY", config.wb_api_key)
-config.google_sheets_url = os.getenv("GOOGLE_SHEETS_URL", config.google_sheets_url)
 
 async def test_real_monitoring_cycle():
     """
@@ -123,13 +120,11 @@ async def test_real_monitoring_cycle():
     print(f"  • Уведомлений отправлено: {stats['notified_slots_count']}")
     
     # Проверяем, создались ли файлы с найденными слотами
-    today_str = datetime.now().strftime('%Y-%m-%d')
-    slots_file = f"found_slots/slots_{today_str}.json"
+    slots_file = found_slots_filename(datetime.now())
     
     if os.path.exists(slots_file):
         try:
-            with open(slots_file, "r", encoding="utf-8") as f:
-                found_slots = json.load(f)
+            found_slots = load_json_lines(slots_file)
             
             print(f"\n🎯 Найденные слоты (сохранены в {slots_file}):")
             print(f"  • Общее количество: {len(found_slots)}")
@@ -20,7 +20,6 @@ try:
 except ImportError:
     pass
 
-config.wb_api_key = os.getenv("WB_API_KEY", config.wb_api_key)
 
 async def analyze_warehouse_names():
     """
@@ -22,7 +22,6 @@ try:
 except ImportError:
     print("⚠️ python-dotenv не установлен, используем переменные окружения")
 
-config.wb_api_key = os.getenv("WB_API_KEY", config.wb_api_key)
 
 
 async def test_warehouses_detailed():
@@ -14,7 +14,7 @@ import logging
 logger = logging.getLogger(__name__)
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class ProductInfo:
     """Информация о товаре для проверки слотов"""
     barcode: str
@@ -76,22 +76,25 @@ class SimpleRateLimiter:
             'coefficients': 1.0  # 1 секунда между запросами коэффициентов
         }
         self.last_request_time = {endpoint: 0 for endpoint in self.min_intervals.keys()}
+        # Блокировки на каждый тип endpoint, чтобы параллельные запросы не проскакивали интервал
+        self._locks = {endpoint: asyncio.Lock() for endpoint in self.min_intervals.keys()}
     
     async def wait_if_needed(self, endpoint_type: str = 'general'):
         """Ждет минимальный интервал между запросами"""
         if endpoint_type not in self.min_intervals:
             endpoint_type = 'general'
         
-        now = time.time()
-        min_interval = self.min_intervals[endpoint_type]
-        time_since_last = now - self.last_request_time[endpoint_type]
-        
-        if time_since_last < min_interval:
-            sleep_time = min_interval - time_since_last
-            logger.debug(f"⏳ Пауза между запросами: {sleep_time:.1f}с")
-            await asyncio.sleep(sleep_time)
-        
-        self.last_request_time[endpoint_type] = time.time()
+        async with self._locks[endpoint_type]:
+            now = time.time()
+            min_interval = self.min_intervals[endpoint_type]
+            time_since_last = now - self.last_request_time[endpoint_type]
+            
+            if time_since_last < min_interval:
+                sleep_time = min_interval - time_since_last
+                logger.debug(f"⏳ Пауза между запросами: {sleep_time:.1f}с")
+                await asyncio.sleep(sleep_time)
+            
+            self.last_request_time[endpoint_type] = time.time()
 
 
 class WildberriesAPI:
@@ -103,6 +106,9 @@ class WildberriesAPI:
         self.api_key = api_key
         self.base_url = base_url
         self.rate_limiter = SimpleRateLimiter()
+        # Одна HTTP-сессия на клиента: соединения с WB (TCP + TLS) переиспользуются между запросами
+        # Создается при первом запросе, так как должна принадлежать работающему event loop
+        self._session: Optional[aiohttp.ClientSession] = None
         
         # Заголовки для всех запросов
         self.headers = {
@@ -111,6 +117,24 @@ class WildberriesAPI:
             "User-Agent": "WB-Monitor/1.0"
         }
     
+    def _get_session(self) -> aiohttp.ClientSession:
+        """Возвращает общую HTTP-сессию клиента, создавая ее при необходимости"""
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession()
+        return self._session
+    
+    async def close(self):
+        """Закрывает HTTP-сессию клиента (вызывать при завершении работы)"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+    
+    async def __aenter__(self) -> "WildberriesAPI":
+        return self
+    
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+    
     async def _make_request(self, method: str, endpoint: str, 
                           data: Optional[Dict] = None, 
                           params: Optional[Dict] = None,
@@ -124,41 +148,41 @@ class WildberriesAPI:
         url = f"{self.base_url}{endpoint}"
         start_time = time.time()
         
-        async with aiohttp.ClientSession() as session:
-            try:
-                async with session.request(
-                    method=method,
-                    url=url,
-                    headers=self.headers,
-                    json=data,
-                    params=params
-                ) as response:
-                    
-                    # Измеряем время выполнения запроса
-                    request_duration = time.time() - start_time
-                    
-                    # Логируем запрос для отладки
-                    logger.info(f"🔄 {method} {endpoint} -> {response.status} ({request_duration:.1f}с)")
-                    
-                    response_text = await response.text()
-                    
-                    if response.status == 429:
-                        logger.warning("⚠️ Получили 429 (Too Many Requests)")
-                        raise Exception("Rate limit exceeded")
-                    
-                    if response.status == 401:
-                        logger.error("❌ Ошибка авторизации (401) - проверьте API ключ")
-                        raise Exception("Authorization failed")
-                    
-                    if response.status not in [200, 201]:
-                        logger.error(f"❌ HTTP {response.status}: {response_text}")
-                        raise Exception(f"HTTP {response.status}: {response_text}")
-                    
-                    return json.loads(response_text)
-                    
-            except aiohttp.ClientError as e:
-                logger.error(f"❌ Ошибка соединения: {e}")
-                raise Exception(f"Connection error: {e}")
+        session = self._get_session()
+        try:
+            async with session.request(
+                method=method,
+                url=url,
+                headers=self.headers,
+                json=data,
+                params=params
+            ) as response:
+                
+                # Измеряем время выполнения запроса
+                request_duration = time.time() - start_time
+                
+                # Логируем запрос для отладки
+                logger.info(f"🔄 {method} {endpoint} -> {response.status} ({request_duration:.1f}с)")
+                
+                response_text = await response.text()
+                
+                if response.status == 429:
+                    logger.warning("⚠️ Получили 429 (Too Many Requests)")
+                    raise Exception("Rate limit exceeded")
+                
+                if response.status == 401:
+                    logger.error("❌ Ошибка авторизации (401) - проверьте API ключ")
+                    raise Exception("Authorization failed")
+                
+                if response.status not in [200, 201]:
+                    logger.error(f"❌ HTTP {response.status}: {response_text}")
+                    raise Exception(f"HTTP {response.status}: {response_text}")
+                
+                return json.loads(response_text)
+                
+        except aiohttp.ClientError as e:
+            logger.error(f"❌ Ошибка соединения: {e}")
+            raise Exception(f"Connection error: {e}")
     
     async def get_warehouses(self) -> List[Dict[str, Any]]:
         """
@@ -350,19 +374,18 @@ async def test_wb_api():
     """
     Тестовая функция для проверки работы с API
     """
-    api = WildberriesAPI("ваш_api_ключ_здесь")
-    
-    # Тестируем соединение
-    if not await api.test_connection():
-        return
-    
-    # Тестируем проверку слотов
-    test_products = [
-        ProductInfo(barcode="test_barcode_1", quantity=1),
-        ProductInfo(barcode="test_barcode_2", quantity=5)
-    ]
-    
-    slots = await api.check_acceptance_options(test_products)
+    async with WildberriesAPI("ваш_api_ключ_здесь") as api:
+        # Тестируем соединение
+        if not await api.test_connection():
+            return
+        
+        # Тестируем проверку слотов
+        test_products = [
+            ProductInfo(barcode="test_barcode_1", quantity=1),
+            ProductInfo(barcode="test_barcode_2", quantity=5)
+        ]
+        
+        slots = await api.check_acceptance_options(test_products)
     
     for slot in slots:
         if slot.is_error: